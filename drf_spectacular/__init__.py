@@ -1 +1,3 @@
 __version__ = '0.9.0'
+
+default_app_config = 'drf_spectacular.apps.SpectacularConfig'
@@ -0,0 +1,32 @@
+import os
+import sys
+
+from django.apps import AppConfig
+
+
+def is_management_command():
+    """
+    whether this process runs a management command other than the server itself. those must
+    not warm up the cache, e.g. ``spectacular`` would share its generator stats with the warm-up.
+    the autoreloader parent of ``runserver`` only watches files and is skipped as well.
+    """
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program == '__main__.py':
+        program = os.path.basename(os.path.dirname(sys.argv[0]))
+    if program not in ('manage.py', 'django-admin', 'django-admin.py', 'django'):
+        return False
+    if len(sys.argv) < 2 or sys.argv[1] != 'runserver':
+        return True
+    return '--noreload' not in sys.argv and os.environ.get('RUN_MAIN') != 'true'
+
+
+class SpectacularConfig(AppConfig):
+    name = 'drf_spectacular'
+    verbose_name = 'drf-spectacular'
+
+    def ready(self):
+        from drf_spectacular.settings import spectacular_settings
+
+        if spectacular_settings.SERVE_CACHE_WARMUP and not is_management_command():
+            from drf_spectacular.cache import start_schema_warmup
+            start_schema_warmup(render=spectacular_settings.SERVE_CACHE_WARMUP_RENDER)
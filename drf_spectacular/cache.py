@@ -0,0 +1,457 @@
+import gzip
+import hashlib
+import inspect
+import io
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from django.utils.http import quote_etag
+
+from drf_spectacular import __version__
+from drf_spectacular.plumbing import GENERATOR_STATS, filter_schema_by_tags, get_schema_tags, info, warn
+from drf_spectacular.settings import SPECTACULAR_DEFAULTS, spectacular_settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _stable_repr(value) -> str:
+    """ repr that is identical across processes, i.e. free of memory addresses """
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_stable_repr(v) for v in value) + ']'
+    elif isinstance(value, dict):
+        return '{' + ', '.join(f'{_stable_repr(k)}: {_stable_repr(v)}' for k, v in value.items()) + '}'
+    elif isinstance(value, Promise):
+        return repr(force_str(value))
+    elif inspect.isclass(value) or inspect.isfunction(value):
+        return f'{value.__module__}.{value.__qualname__}'
+    elif inspect.ismodule(value):
+        return value.__name__
+    return repr(value)
+
+
+def get_schema_cache_key(urlconf, generator_class) -> str:
+    """
+    fingerprint of everything besides the code itself that goes into a generated schema:
+    the urlconf, the generator class, all spectacular settings and the DRF settings, e.g.
+    default authentication, pagination and renderers. stable across processes.
+    """
+    parts = [
+        __version__,
+        rest_framework.VERSION,
+        _stable_repr(urlconf or settings.ROOT_URLCONF),
+        _stable_repr(generator_class),
+    ]
+    parts += [f'{name}={_stable_repr(getattr(spectacular_settings, name))}' for name in sorted(SPECTACULAR_DEFAULTS)]
+    drf_settings = getattr(settings, 'REST_FRAMEWORK', {})
+    parts += [f'REST_FRAMEWORK.{name}={_stable_repr(drf_settings[name])}' for name in sorted(drf_settings)]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+
+class OperationCache:
+    """
+    keeps inspected operations in ``directory`` across generator runs, e.g. on CI. entries
+    are looked up by the settings fingerprint, the endpoint and its view and schema class.
+    they are only used as long as the source files they were derived from are unchanged.
+    the directory may be deleted at any time.
+
+    entries are pickled. loading them executes code, so the directory must only be
+    writable by trusted users, i.e. never point it at a shared or world-writable location.
+    """
+
+    # bumped whenever the layout of entries changes, so that old entries are never loaded
+    FORMAT_VERSION = 2
+
+    def __init__(self, directory, fingerprint):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self._digests = {}
+
+    def get_key(self, path, method, view) -> str:
+        parts = [
+            str(self.FORMAT_VERSION),
+            self.fingerprint,
+            path,
+            method,
+            _stable_repr(view.__class__),
+            _stable_repr(view.schema.__class__),
+            _stable_repr(getattr(view, 'action', None)),
+        ]
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def load(self, key):
+        """ :return: the stored entry or None if there is none or its sources changed """
+        try:
+            with open(self._get_path(key), 'rb') as fh:
+                entry = pickle.load(fh)
+        except Exception:  # missing, truncated or written by an incompatible version
+            return None
+        if any(self.get_digest(path) != digest for path, digest in entry['files'].items()):
+            return None
+        return entry
+
+    def store(self, key, entry, files):
+        """ store ``entry`` together with the digests of the source ``files`` it was derived from """
+        entry = {**entry, 'files': {path: self.get_digest(path) for path in files}}
+        try:
+            content = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            return  # e.g. instances of local classes. inspected again next time
+        os.makedirs(self.directory, exist_ok=True)
+        # written atomically so that concurrent runs never load partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(content)
+        os.replace(tmp_path, self._get_path(key))
+
+    def get_digest(self, path):
+        if path not in self._digests:
+            try:
+                with open(path, 'rb') as fh:
+                    self._digests[path] = hashlib.sha256(fh.read()).hexdigest()
+            except OSError:
+                self._digests[path] = None
+        return self._digests[path]
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, f'{key}.pickle')
+
+
+def _gzip_compress(content):
+    buffer = io.BytesIO()
+    # fixed mtime for reproducible output and thus stable ETags
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as fh:
+        fh.write(content)
+    return buffer.getvalue()
+
+
+COMPRESSORS = {'gzip': _gzip_compress}
+if brotli:
+    COMPRESSORS['br'] = brotli.compress
+
+
+def get_content_encodings():
+    """ configured content encodings that are actually available, in order of preference """
+    return [e for e in spectacular_settings.SERVE_CACHE_COMPRESSION if e in COMPRESSORS]
+
+
+def choose_content_encoding(accept_encoding):
+    """
+    pick the best available encoding for the given Accept-Encoding header. ties in
+    quality are resolved by preference order. ``None`` stands for identity.
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    best_encoding, best_quality = None, 0.0
+    for encoding in get_content_encodings():
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+    return best_encoding
+
+
+class DjangoCacheSchemaStorage:
+    """
+    shares generated schemas and their renderings between processes and hosts through
+    the Django cache configured with ``SERVE_CACHE_ALIAS``. works with any backend that
+    can hold the schema size, e.g. locmem, filebased or database caches.
+
+    keys are versioned with ``SERVE_CACHE_VERSION`` and a generation counter that is
+    increased by :meth:`invalidate`.
+    """
+    generation_key = 'drf-spectacular:generation'
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or spectacular_settings.SERVE_CACHE_ALIAS]
+        self.version = spectacular_settings.SERVE_CACHE_VERSION
+        self.generation = self.cache.get_or_set(self.generation_key, 0, timeout=None, version=self.version)
+
+    def get(self, key):
+        return self.cache.get(self._make_key(key), version=self.version)
+
+    def set(self, key, value):
+        self.cache.set(self._make_key(key), value, timeout=None, version=self.version)
+
+    def invalidate(self):
+        try:
+            self.cache.incr(self.generation_key, version=self.version)
+        except ValueError:
+            self.cache.set(self.generation_key, self.generation + 1, timeout=None, version=self.version)
+
+    def _make_key(self, key):
+        return f'drf-spectacular:{self.generation}:{key}'
+
+
+def get_schema_storage():
+    """ shared schema storage configured with ``SERVE_CACHE_STORAGE`` or None """
+    storage_class = spectacular_settings.SERVE_CACHE_STORAGE
+    return storage_class() if storage_class else None
+
+
+class CachedSchema:
+    """
+    generated schema together with its rendered representations. every format is
+    rendered and compressed at most once and kept as bytes alongside strong ETags.
+
+    with a shared ``storage``, every piece is looked up there first and written back
+    once it was produced, so other processes can reuse it. the schema itself is only
+    loaded from storage if a representation needs to be rendered.
+    """
+
+    def __init__(self, key, generate, storage=None):
+        self.key = key
+        self._generate = generate
+        self._storage = storage
+        self._schema = None
+        self._renderings = {}
+        self._tag_sizes = {}
+        self._lock = threading.RLock()
+
+        self.last_modified = self._load('last_modified')
+        if self.last_modified is None:
+            self._schema = self._generate_schema()
+
+    @property
+    def schema(self):
+        with self._lock:
+            if self._schema is None:
+                self._schema = self._load('schema')
+            if self._schema is None:
+                # evicted from storage in the meantime
+                self._schema = self._generate_schema()
+            # the schema is kept from now on. drop what generating it would need, e.g. the
+            # generator and request of a private schema
+            self._generate = None
+            return self._schema
+
+    def render(self, renderer, encoding=None):
+        """ :return: tuple of rendered (and possibly compressed) content and its ETag """
+        storage_key = f'{renderer.media_type}:{encoding}'
+        with self._lock:
+            if storage_key not in self._renderings:
+                self._renderings[storage_key] = self._load(storage_key)
+            if self._renderings[storage_key] is None:
+                self._render(renderer)
+            return self._renderings[storage_key]
+
+    def get_tag_sizes(self, renderer) -> dict:
+        """
+        size in bytes of the sub-schema of every tag as rendered by ``renderer``. computed
+        once for all tags instead of keeping every sub-schema in the bounded subset cache.
+        """
+        storage_key = f'{renderer.media_type}:tag_sizes'
+        with self._lock:
+            if storage_key not in self._tag_sizes:
+                self._tag_sizes[storage_key] = self._load(storage_key)
+            if self._tag_sizes[storage_key] is None:
+                self._tag_sizes[storage_key] = {
+                    tag: len(renderer.render(filter_schema_by_tags(self.schema, [tag]), renderer_context={}))
+                    for tag in get_schema_tags(self.schema)
+                }
+                self._store(storage_key, self._tag_sizes[storage_key])
+            return self._tag_sizes[storage_key]
+
+    def _render(self, renderer):
+        content = renderer.render(self.schema, renderer_context={})
+        variants = {None: content}
+        for content_encoding in get_content_encodings():
+            variants[content_encoding] = COMPRESSORS[content_encoding](content)
+
+        for content_encoding, variant in variants.items():
+            storage_key = f'{renderer.media_type}:{content_encoding}'
+            self._renderings[storage_key] = (variant, quote_etag(hashlib.sha256(variant).hexdigest()))
+            self._store(storage_key, self._renderings[storage_key])
+
+    def _generate_schema(self):
+        schema = self._generate()
+        self._generate = None
+        # HTTP dates have a resolution of seconds
+        self.last_modified = int(time.time())
+        self._store('schema', schema)
+        self._store('last_modified', self.last_modified)
+        return schema
+
+    def _load(self, name):
+        return self._storage.get(f'{self.key}:{name}') if self._storage else None
+
+    def _store(self, name, value):
+        if self._storage:
+            self._storage.set(f'{self.key}:{name}', value)
+
+
+class SchemaCache:
+    """
+    thread-safe in-process store for generated schemas. concurrent requests for a cold
+    key wait for the first generation instead of starting their own. generation runs
+    without holding the cache-wide lock, so other keys are served in the meantime.
+
+    optionally bounded by ``maxsize`` entries (least recently used are evicted first)
+    and ``ttl`` seconds after which an entry is regenerated. both may be given as
+    callables, e.g. to follow settings, which are then looked up on every access.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        # keys being generated, set once the generation finished or failed
+        self._pending = {}
+        # increased by invalidate() so that generations started before are not stored
+        self._generation = 0
+        self._lock = threading.RLock()
+
+    @property
+    def maxsize(self):
+        return self._maxsize() if callable(self._maxsize) else self._maxsize
+
+    @property
+    def ttl(self):
+        return self._ttl() if callable(self._ttl) else self._ttl
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_create(self, key, factory):
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    created, value = self._entries[key]
+                    ttl = self.ttl
+                    if ttl is None or time.monotonic() - created < ttl:
+                        self._entries.move_to_end(key)
+                        return value
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    generation = self._generation
+                    break
+            # look again once the other generation is done. if it failed, generate here
+            pending.wait()
+
+        try:
+            value = factory()
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic(), value)
+                    self._entries.move_to_end(key)
+                    maxsize = self.maxsize
+                    while maxsize is not None and len(self._entries) > maxsize:
+                        self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+SCHEMA_CACHE = SchemaCache()
+
+# non-public schemas, keyed by the visibility fingerprint of the requesting user
+PRIVATE_SCHEMA_CACHE = SchemaCache(
+    maxsize=lambda: spectacular_settings.SERVE_PRIVATE_CACHE_MAXSIZE,
+    ttl=lambda: spectacular_settings.SERVE_PRIVATE_CACHE_TTL,
+)
+
+# schemas of endpoint subsets and tags requested with query parameters. bounded, as every
+# distinct request may create an entry
+SUBSET_SCHEMA_CACHE = SchemaCache(maxsize=lambda: spectacular_settings.SERVE_SUBSET_CACHE_MAXSIZE)
+
+# endpoints enumerated from a urlconf and shared by all generators until it changes.
+# see SchemaGenerator._initialise_endpoints()
+ENDPOINT_CACHE = {}
+
+# operations of the endpoints above, per generator and endpoint filters, valid as long as
+# the endpoints are. see SchemaGenerator.get_operation_index()
+OPERATION_INDEX_CACHE = {}
+
+
+def invalidate_schema_cache():
+    """
+    drop all cached schemas. call this if your API changed at runtime. other processes
+    sharing a storage keep their in-memory copy until they invalidate themselves.
+    """
+    SCHEMA_CACHE.invalidate()
+    PRIVATE_SCHEMA_CACHE.invalidate()
+    SUBSET_SCHEMA_CACHE.invalidate()
+    ENDPOINT_CACHE.clear()
+    OPERATION_INDEX_CACHE.clear()
+    storage = get_schema_storage()
+    if storage:
+        storage.invalidate()
+
+
+def warmup_schema_cache(render=False, fail_silently=True):
+    """
+    generate the schema served by ``SpectacularAPIView`` ahead of the first request and
+    optionally render it in all formats and encodings. failures are reported as warnings
+    unless ``fail_silently`` is False, in which case they are raised.
+    """
+    from drf_spectacular.views import SpectacularAPIView
+
+    if not spectacular_settings.SERVE_CACHE or not spectacular_settings.SERVE_PUBLIC:
+        warn('schema cache warm-up requires SERVE_CACHE=True and SERVE_PUBLIC=True. skipping.')
+        return
+
+    start = time.perf_counter()
+    view = SpectacularAPIView()
+    try:
+        cached_schema = view.get_cached_schema()
+        if render:
+            for renderer_class in view.renderer_classes:
+                cached_schema.render(renderer_class())
+    except Exception as exc:
+        if not fail_silently:
+            raise
+        warn(f'schema cache warm-up failed with {exc.__class__.__name__}: {exc}')
+        return
+
+    GENERATOR_STATS.warmup_duration = time.perf_counter() - start
+    info(f'schema cache warm-up finished in {GENERATOR_STATS.warmup_duration:.2f}s')
+
+
+def start_schema_warmup(render=False) -> threading.Thread:
+    """ run :func:`warmup_schema_cache` in a background thread once the app registry is ready """
+    def target():
+        apps.ready_event.wait()
+        warmup_schema_cache(render=render)
+
+    thread = threading.Thread(target=target, name='drf-spectacular-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+@receiver(setting_changed)
+def _invalidate_on_setting_changed(setting, **kwargs):
+    if setting in ('SPECTACULAR_SETTINGS', 'REST_FRAMEWORK', 'ROOT_URLCONF'):
+        invalidate_schema_cache()
@@ -1,12 +1,16 @@
+import json
+import re
+from contextlib import ExitStack
 from textwrap import dedent
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils.module_loading import import_string
-from rest_framework import renderers
 
+from drf_spectacular.cache import warmup_schema_cache
 from drf_spectacular.settings import spectacular_settings
-from drf_spectacular.plumbing import GENERATOR_STATS
-from drf_spectacular.renderers import NoAliasOpenAPIRenderer
+from drf_spectacular.plumbing import GENERATOR_STATS, ComponentMemo, EndpointFilter, info
+from drf_spectacular.profiling import GenerationProfiler, MemoryProfiler, profile_phase
+from drf_spectacular.renderers import NoAliasOpenAPIRenderer, OpenApiJsonRenderer
 from drf_spectacular.validation import validate_schema
 
 
@@ -25,40 +29,177 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('--format', dest="format", choices=['openapi', 'openapi-json'], default='openapi', type=str)
-        parser.add_argument('--urlconf', dest="urlconf", default=None, type=str)
+        parser.add_argument(
+            '--urlconf', dest="urlconf", default=None, type=str, action='append',
+            help='given multiple times, the schemas of all urlconfs are generated in one pass '
+                 'and written to --file with {urlconf} replaced by the urlconf'
+        )
         parser.add_argument('--generator-class', dest="generator_class", default=None, type=str)
         parser.add_argument('--file', dest="file", default=None, type=str)
         parser.add_argument('--fail-on-warn', dest="fail_on_warn", default=False, action='store_true')
         parser.add_argument('--validate', dest="validate", default=False, action='store_true')
+        for kind in EndpointFilter.KINDS:
+            option = kind.replace('_', '-')
+            parser.add_argument(
+                f'--include-{option}', dest=f"include_{kind}", default=None, action='append',
+                help=f'only generate endpoints whose {kind.replace("_", " ")} matches this regular expression. '
+                     f'may be given multiple times'
+            )
+            parser.add_argument(
+                f'--exclude-{option}', dest=f"exclude_{kind}", default=None, action='append',
+                help=f'skip endpoints whose {kind.replace("_", " ")} matches this regular expression. '
+                     f'may be given multiple times'
+            )
+        parser.add_argument(
+            '--jobs', dest="jobs", default=None, type=int,
+            help='inspect the endpoints in this many worker processes'
+        )
+        parser.add_argument(
+            '--stream', dest="stream", default=False, action='store_true',
+            help='write each path as soon as it is inspected and the components at the end. '
+                 'keeps memory flat on large APIs. cannot be combined with --validate'
+        )
+        parser.add_argument(
+            '--profile', dest="profile", default=False, action='store_true',
+            help='report the slowest endpoints, phases, serializers and extensions on stderr'
+        )
+        parser.add_argument(
+            '--profile-top', dest="profile_top", default=20, type=int,
+            help='number of entries per section in the --profile and --memory-report reports'
+        )
+        parser.add_argument(
+            '--profile-json', dest="profile_json", default=None, type=str,
+            help='write the complete profile as JSON to this file. implies --profile'
+        )
+        parser.add_argument(
+            '--memory-report', dest="memory_report", default=False, action='store_true',
+            help='trace allocations and report peak memory, retained memory per subsystem and '
+                 'the allocation sites retaining the most memory on stderr. slows generation down'
+        )
+        parser.add_argument(
+            '--cache-dir', dest="cache_dir", default=None, type=str,
+            help='reuse operations of previous runs from this directory, which must be trusted as entries are '
+                 'pickles. defaults to GENERATOR_CACHE_DIR'
+        )
+        parser.add_argument(
+            '--populate-cache', dest="populate_cache", default=False, action='store_true',
+            help='generate and render the schema served by SpectacularAPIView into SERVE_CACHE_STORAGE'
+        )
 
     def handle(self, *args, **options):
+        if options['populate_cache']:
+            if not spectacular_settings.SERVE_CACHE_STORAGE:
+                raise CommandError('--populate-cache requires a shared SERVE_CACHE_STORAGE')
+            if not spectacular_settings.SERVE_CACHE or not spectacular_settings.SERVE_PUBLIC:
+                raise CommandError('--populate-cache requires SERVE_CACHE=True and SERVE_PUBLIC=True')
+            try:
+                warmup_schema_cache(render=True, fail_silently=False)
+            except Exception as exc:
+                raise CommandError(f'populating the schema cache failed with {exc.__class__.__name__}: {exc}')
+            return
+
+        if options['stream'] and options['validate']:
+            raise CommandError('--validate requires the complete schema and cannot be used with --stream')
+
         if options['generator_class']:
             generator_class = import_string(options['generator_class'])
         else:
             generator_class = spectacular_settings.DEFAULT_GENERATOR_CLASS
 
-        generator = generator_class(urlconf=options['urlconf'])
-        schema = generator.get_schema(request=None, public=True)
+        # several urlconfs are generated in one pass and share their serializer schemas
+        urlconfs = options['urlconf'] if isinstance(options['urlconf'], list) else [options['urlconf']]
+        if len(urlconfs) > 1 and '{urlconf}' not in (options['file'] or ''):
+            raise CommandError('multiple --urlconf require a --file containing {urlconf}, e.g. schema-{urlconf}.yml')
 
-        if options['fail_on_warn'] and GENERATOR_STATS.warn_counter:
-            raise RuntimeError(
-                f'Failing as requested due to {GENERATOR_STATS.warn_counter} warnings'
-            )
+        generator_kwargs = {}
+        if options['cache_dir']:
+            generator_kwargs['cache_dir'] = options['cache_dir']
+        for mode in ['include', 'exclude']:
+            patterns = {kind: options[f'{mode}_{kind}'] for kind in EndpointFilter.KINDS if options[f'{mode}_{kind}']}
+            if patterns:
+                generator_kwargs[mode] = patterns
+        component_memo = ComponentMemo() if len(urlconfs) > 1 else None
+        if component_memo:
+            generator_kwargs['component_memo'] = component_memo
+        try:
+            generators = [generator_class(urlconf=urlconf, **generator_kwargs) for urlconf in urlconfs]
+        except re.error as e:
+            raise CommandError(f'invalid endpoint filter pattern: {e}')
+
+        profiler = GenerationProfiler() if options['profile'] or options['profile_json'] else None
+        memory = MemoryProfiler() if options['memory_report'] else None
+        with profiler or ExitStack(), memory or ExitStack():
+            for urlconf, generator in zip(urlconfs, generators):
+                if len(urlconfs) > 1:
+                    file, label = options['file'].replace('{urlconf}', urlconf), f' [{urlconf}]'
+                else:
+                    file, label = options['file'], ''
+                self.generate(generator, file, options, memory, label)
+
+        if component_memo:
+            info(f'component memo: {component_memo.hits} hits, {component_memo.misses} misses')
+        if profiler:
+            self.stderr.write(profiler.get_report(top=options['profile_top']))
+        if options['profile_json']:
+            with open(options['profile_json'], 'w') as fh:
+                json.dump(profiler.as_dict(), fh, indent=2)
+        if memory:
+            self.stderr.write(memory.get_report(top=options['profile_top']))
+
+    def generate(self, generator, file, options, memory=None, label=''):
+        get_schema = generator.get_schema_stream if options['stream'] else generator.get_schema
+        with memory.phase(f'generation{label}') if memory else ExitStack():
+            if options['jobs'] and options['jobs'] > 1:
+                schema = get_schema(request=None, public=True, jobs=options['jobs'])
+            else:
+                schema = get_schema(request=None, public=True)
+        if memory:
+            # sites are taken before rendering, while everything generation retains is alive
+            memory.take_snapshot()
+
+        if not options['stream']:
+            self.check_warnings(options)
         if options['validate']:
-            validate_schema(schema)
+            with profile_phase('generator', 'validation'):
+                validate_schema(schema)
 
-        renderer = self.get_renderer(options['format'])
-        output = renderer.render(schema, renderer_context={})
+        # with --stream, this is also where the endpoints are inspected
+        with profile_phase('generator', 'rendering'), memory.phase(f'rendering{label}') if memory else ExitStack():
+            self.write_schema(self.get_renderer(options['format']), schema, file)
+        if options['stream']:
+            # warnings are only known once everything is written
+            self.check_warnings(options)
+        if memory:
+            memory.release_generator(generator, schema, label)
 
-        if options['file']:
-            with open(options['file'], 'wb') as f:
-                f.write(output)
+        if GENERATOR_STATS.operation_cache_hits or GENERATOR_STATS.operation_cache_misses:
+            info(
+                f'operation cache{label}: {GENERATOR_STATS.operation_cache_hits} hits, '
+                f'{GENERATOR_STATS.operation_cache_misses} misses'
+            )
+
+    def write_schema(self, renderer, schema, file):
+        # write incrementally so the rendered document is never held in memory as a whole
+        if file:
+            with open(file, 'wb') as f:
+                for chunk in renderer.render_stream(schema):
+                    f.write(chunk)
         else:
-            self.stdout.write(output.decode())
+            chunk = b''
+            for chunk in renderer.render_stream(schema):
+                self.stdout.write(chunk.decode(), ending='')
+            if not chunk.endswith(b'\n'):
+                self.stdout.write('')
+
+    def check_warnings(self, options):
+        if options['fail_on_warn'] and GENERATOR_STATS.warn_counter:
+            raise RuntimeError(
+                f'Failing as requested due to {GENERATOR_STATS.warn_counter} warnings'
+            )
 
     def get_renderer(self, format):
         renderer_cls = {
             'openapi': NoAliasOpenAPIRenderer,
-            'openapi-json': renderers.JSONOpenAPIRenderer,
+            'openapi-json': OpenApiJsonRenderer,
         }[format]
         return renderer_cls()
@@ -1,14 +1,23 @@
+import copy
+import hashlib
 import inspect
+import math
+import multiprocessing
+import os
 import re
 import typing
-from collections import OrderedDict
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from importlib import import_module
 from operator import attrgetter
 from urllib.parse import urljoin
 
 import uritemplate
+from django.conf import settings
 from django.core import validators, exceptions as django_exceptions
-from django.db import models
+from django.db import connections, models
+from django.urls import URLResolver
 from django.utils.encoding import force_str
 from rest_framework import permissions, renderers, serializers, views, viewsets
 from rest_framework.fields import _UnvalidatedField, empty
@@ -21,11 +30,14 @@ from drf_spectacular.settings import spectacular_settings
 from drf_spectacular.contrib.authentication import *  # noqa: F403, F401
 from drf_spectacular.contrib.serializers import *  # noqa: F403, F401
 from drf_spectacular.plumbing import (
-    build_basic_type, warn, anyisinstance, force_instance, is_serializer,
+    build_basic_type, warn, force_instance, is_serializer,
     follow_field_source, is_field, is_basic_type, alpha_operation_sorter,
     get_field_from_model, build_array_type, ComponentRegistry, ResolvedComponent,
-    build_root_object, reset_generator_stats, build_parameter_type
+    build_root_object, reset_generator_stats, build_parameter_type, RegistrationOrder, GENERATOR_STATS,
+    info, collecting_warnings, LazyMapping, EndpointFilter, ComponentMemo, prune_components,
+    get_component_references, filter_schema_by_operations, _get_registered_class_path,
 )
+from drf_spectacular.profiling import get_active_profiler, profile_phase
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter
 from drf_spectacular.authentication import OpenApiAuthenticationExtension
@@ -33,8 +45,18 @@ from drf_spectacular.serializers import OpenApiSerializerExtension
 
 
 class SchemaGenerator(BaseSchemaGenerator):
-    def __init__(self, *args, **kwargs):
-        self.registry = ComponentRegistry()
+    def __init__(
+        self, *args, cache_dir=None, include=None, exclude=None, globs=False, component_memo=None, **kwargs
+    ):
+        # share serializer schemas with other generators. see ComponentMemo and get_schemas()
+        self.component_memo = component_memo
+        self.registry = ComponentRegistry(memo=component_memo)
+        # only generate a subset of the endpoints in addition to ENDPOINT_INCLUDE and
+        # ENDPOINT_EXCLUDE. patterns are regular expressions or, with ``globs``, strings
+        # with ``*`` wildcards. see EndpointFilter
+        self.endpoint_filter = EndpointFilter(include, exclude, globs=globs)
+        # directory of the on-disk operation cache. defaults to GENERATOR_CACHE_DIR
+        self.cache_dir = cache_dir
         super().__init__(*args, **kwargs)
 
     def create_view(self, callback, method, request=None):
@@ -64,10 +86,130 @@ class SchemaGenerator(BaseSchemaGenerator):
 
         return view
 
+    def _initialise_endpoints(self):
+        """
+        enumerating the endpoints walks the whole resolver tree. the endpoints of a urlconf
+        are thus shared between generators until one of its modules changes.
+        """
+        if self.endpoints is not None or self.patterns is not None:
+            return super()._initialise_endpoints()
+
+        from drf_spectacular.cache import ENDPOINT_CACHE
+
+        urlconf = self.urlconf or settings.ROOT_URLCONF
+        urlconf_module = import_module(urlconf) if isinstance(urlconf, str) else urlconf
+        key = (urlconf, self.endpoint_inspector_cls)
+        cached = ENDPOINT_CACHE.get(key)
+        if cached is not None:
+            urlpatterns, mtimes, endpoints = cached
+            if urlpatterns is urlconf_module.urlpatterns and all(_get_mtime(p) == m for p, m in mtimes.items()):
+                self.endpoints = endpoints
+                return
+
+        # taken before enumerating so that concurrent edits are picked up next time
+        mtimes = {path: _get_mtime(path) for path in _get_urlconf_files(urlconf_module)}
+        super()._initialise_endpoints()
+        ENDPOINT_CACHE[key] = (urlconf_module.urlpatterns, mtimes, self.endpoints)
+
+    def _get_endpoint_filters(self):
+        endpoint_filter = EndpointFilter(spectacular_settings.ENDPOINT_INCLUDE, spectacular_settings.ENDPOINT_EXCLUDE)
+        return [f for f in (endpoint_filter, self.endpoint_filter) if f]
+
+    def _get_paths_and_endpoints(self, request):
+        """
+        like DRF's version, except for endpoints excluded with @extend_schema(exclude=True)
+        or filtered out by the endpoint filters. they are recognized from the callback and
+        skipped before creating their view.
+        """
+        paths = []
+        view_endpoints = []
+        endpoint_filters = self._get_endpoint_filters()
+        for path, method, callback in self.endpoints:
+            if not self._is_endpoint_included(path, method, callback, endpoint_filters):
+                continue
+            view = self.create_view(callback, method, request)
+            path = self.coerce_path(path, method, view)
+            paths.append(path)
+            view_endpoints.append((path, method, view))
+
+        return paths, view_endpoints
+
+    def _is_endpoint_included(self, path, method, callback, endpoint_filters):
+        if not all(f.matches(path, method, callback) for f in endpoint_filters):
+            return False
+        return not getattr(self._get_callback_schema(callback, method), '_spectacular_exclude', False)
+
+    def get_operation_index(self) -> typing.Dict[typing.Tuple[str, str], tuple]:
+        """
+        ``(path, method)`` of every operation as in the schema, mapped to the ``(path, method,
+        callback)`` of the endpoint it is generated from. like the endpoints, the index is
+        shared between generators until they change. see _initialise_endpoints()
+        """
+        from drf_spectacular.cache import OPERATION_INDEX_CACHE
+
+        self._initialise_endpoints()
+        endpoint_filters = self._get_endpoint_filters()
+        key = (
+            self.urlconf or settings.ROOT_URLCONF, self.endpoint_inspector_cls, self.__class__, self.url,
+            tuple(f.get_fingerprint() for f in endpoint_filters),
+        )
+        cached = OPERATION_INDEX_CACHE.get(key)
+        if cached is not None and cached[0] is self.endpoints:
+            return cached[1]
+
+        index = {}
+        for path, method, callback in self.endpoints:
+            if self._is_endpoint_included(path, method, callback, endpoint_filters):
+                path = self.coerce_path(path, method, self.create_view(callback, method))
+                index[(self._get_schema_path(path), method.lower())] = (path, method, callback)
+        OPERATION_INDEX_CACHE[key] = (self.endpoints, index)
+        return index
+
+    def get_permitted_operations(self, request) -> typing.Set[typing.Tuple[str, str]]:
+        """
+        ``(path, method)`` of the operations the user of ``request`` has access to, as in the
+        schema. only the permission checks run, nothing is inspected. see get_operation_index()
+        """
+        return {
+            key for key, (path, method, callback) in self.get_operation_index().items()
+            if self.has_view_permissions(path, method, self.create_view(callback, method, request))
+        }
+
+    def filter_schema(self, schema, operations) -> dict:
+        """
+        sub-schema of the full ``schema`` of this generator with only the given operations,
+        e.g. those of get_permitted_operations(), and the components they need. much cheaper
+        than generating with ``public=False``, but serializers are not inspected with the
+        request and components are taken from the full inspection.
+        """
+        return filter_schema_by_operations(schema, operations, keep_paths=spectacular_settings.APPEND_PATHS)
+
+    def _get_callback_schema(self, callback, method):
+        """
+        schema that :meth:`create_view` ends up setting on the view of the callback, looked
+        up without creating the view. accessing the schema on the class would unbind it.
+        """
+        actions = getattr(callback, 'actions', None)
+        if actions is None:
+            action = method.lower()
+        elif method == 'OPTIONS':
+            action = 'metadata'
+        else:
+            action = actions.get(method.lower())
+
+        handler = getattr(callback.cls, action, None) if action else None
+        if hasattr(handler, 'kwargs') and 'schema' in handler.kwargs:
+            return handler.kwargs['schema']
+        initkwargs = getattr(callback, 'initkwargs', {})
+        if 'schema' in initkwargs:
+            return initkwargs['schema']
+        return next((vars(base)['schema'] for base in inspect.getmro(callback.cls) if 'schema' in vars(base)), None)
+
     def get_endpoints(self, request):
         """ sorted endpoints by operation """
-        self._initialise_endpoints()
-        _, endpoints = self._get_paths_and_endpoints(request)
+        with profile_phase('generator', 'endpoint enumeration'):
+            self._initialise_endpoints()
+            _, endpoints = self._get_paths_and_endpoints(request)
 
         if spectacular_settings.OPERATION_SORTER == 'alpha':
             return sorted(endpoints, key=alpha_operation_sorter)
@@ -75,38 +217,366 @@ class SchemaGenerator(BaseSchemaGenerator):
             # default to DRF method sorting
             return endpoints
 
-    def parse(self, request=None):
-        """ Iterate endpoints generating per method path operations. """
-        result = {}
+    def get_view_permissions_fingerprint(self, request) -> str:
+        """
+        fingerprint of everything that decides what the requesting user gets to see: the
+        outcome of the permission checks for every endpoint, the authentication class and
+        the user's group membership. users with the same fingerprint get the same schema.
+        """
+        self._initialise_endpoints()
+        _, endpoints = self._get_paths_and_endpoints(request)
+        parts = [''.join(
+            '1' if self.has_view_permissions(path, method, view) else '0'
+            for path, method, view in endpoints
+        )]
+        authenticator = getattr(request, 'successful_authenticator', None)
+        if authenticator:
+            parts.append(f'{authenticator.__class__.__module__}.{authenticator.__class__.__qualname__}')
+        user = getattr(request, 'user', None)
+        if user is not None:
+            parts.append(f'{user.is_authenticated}:{getattr(user, "is_staff", False)}')
+            parts.append(f'{getattr(user, "is_superuser", False)}')
+            if user.is_authenticated and hasattr(user, 'groups'):
+                parts.extend(sorted(user.groups.values_list('name', flat=True)))
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def parse(self, request=None, jobs=None):
+        """
+        Iterate endpoints generating per method path operations.
 
-        for path, method, view in self.get_endpoints(request):
-            if not self.has_view_permissions(path, method, view):
-                continue
+        :param jobs: inspect the endpoints in this many forked worker processes
+        """
+        result = {}
+        for path, method, operation in self.iter_operations(request, jobs=jobs):
+            result.setdefault(path, {})
+            result[path][method] = operation
+        return result
 
-            # beware that every access to schema yields a fresh object (descriptor pattern)
-            operation = view.schema.get_operation(path, method, self.registry)
+    def iter_operations(self, request=None, jobs=None):
+        """
+        yield ``(path, method, operation)`` for every endpoint in order, each as soon as it is
+        inspected. with serial inspection, only one operation is held at a time. components
+        are registered in :attr:`registry` on the way. paths and methods are given as in the
+        schema, i.e. mount url applied and lowercase.
 
+        :param jobs: inspect the endpoints in this many forked worker processes
+        """
+        for path, method, operation in self._iter_operations(self._get_permitted_endpoints(request), jobs):
             # operation was manually removed via @extend_schema
-            if not operation:
-                continue
+            if operation:
+                yield path, method, operation
 
-            # Normalise path for any provided mount url.
-            if path.startswith('/'):
-                path = path[1:]
-            path = urljoin(self.url or '/', path)
+    def _get_permitted_endpoints(self, request):
+        return [
+            (path, method, view) for path, method, view in self.get_endpoints(request)
+            if self.has_view_permissions(path, method, view)
+        ]
 
-            result.setdefault(path, {})
-            result[path][method.lower()] = operation
+    def _iter_operations(self, endpoints, jobs=None):
+        """ operations of all endpoints, None for excluded ones """
+        # operations given with @extend_schema(operation=...) need no inspection. they
+        # never touch the registry, so leaving them out does not change the outcome.
+        static_operations = [getattr(view.schema, '_spectacular_operation', None) for _, _, view in endpoints]
+        inspected_endpoints = [e for e, operation in zip(endpoints, static_operations) if operation is None]
+
+        threads = spectacular_settings.GENERATOR_THREADS
+        cache_dir = self.cache_dir or spectacular_settings.GENERATOR_CACHE_DIR
+        if jobs and jobs > 1:
+            operations = self._get_operations_sharded(inspected_endpoints, jobs)
+        elif threads and threads > 1:
+            operations = self._get_operations_concurrently(inspected_endpoints, threads)
+        elif cache_dir:
+            operations = self._get_operations_cached(inspected_endpoints, cache_dir)
+        else:
+            operations = self._get_operations(inspected_endpoints)
 
-        return result
+        inspected_operations = iter(operations)
+        for (path, method, view), operation in zip(endpoints, static_operations):
+            if operation is None:
+                operation = next(inspected_operations)
+            yield self._get_schema_path(path), method.lower(), operation
+
+    def _get_schema_path(self, path):
+        # Normalise path for any provided mount url.
+        if path.startswith('/'):
+            path = path[1:]
+        return urljoin(self.url or '/', path)
+
+    def _iter_path_items(self, endpoints, jobs=None):
+        """
+        path items in the order of :meth:`parse`, each as soon as all of its endpoints are
+        inspected, followed by APPEND_PATHS. items are only held back while a path that
+        comes first is still incomplete, which does not happen with the alpha sorter.
+        """
+        remaining = Counter(self._get_schema_path(path) for path, _, _ in endpoints)
+        pending = {}
+        emitted = set()
+        for path, method, operation in self._iter_operations(endpoints, jobs):
+            remaining[path] -= 1
+            if operation:
+                pending.setdefault(path, {})[method] = operation
+            while pending and not remaining[next(iter(pending))]:
+                path, path_item = _pop_first(pending)
+                emitted.add(path)
+                yield path, spectacular_settings.APPEND_PATHS.get(path, path_item)
+        for path, path_item in spectacular_settings.APPEND_PATHS.items():
+            if path not in emitted:
+                yield path, path_item
+
+    def _get_operations(self, endpoints):
+        # beware that every access to schema yields a fresh object (descriptor pattern)
+        return (view.schema.get_operation(path, method, self.registry) for path, method, view in endpoints)
+
+    def _get_operations_cached(self, endpoints, cache_dir):
+        """
+        load operations from the on-disk cache unless a source file they were derived from
+        changed. the others are inspected and stored for the next run. loaded operations
+        register their components and repeat their warnings at the point where inspection
+        would, so the result equals a full inspection.
+        """
+        from drf_spectacular.cache import OperationCache, get_schema_cache_key
+
+        cache = OperationCache(cache_dir, get_schema_cache_key(self.urlconf, self.__class__))
+        operations = []
+        for path, method, view in endpoints:
+            key = cache.get_key(path, method, view)
+            entry = cache.load(key)
+            # components registered by previous operations are not part of the entry. they
+            # must resolve like at the time of inspection and the entry's own components must
+            # not have been registered differently since, otherwise inspection could differ.
+            if entry is not None and all(
+                _get_registered_class_path(self.registry, k) == class_path
+                for k, class_path in entry['references'].items()
+            ) and not any(
+                c.key in self.registry.keys() and (
+                    _get_registered_class_path(self.registry, c.key) != c.object
+                    or self.registry[c.key].schema != c.schema
+                )
+                for c, _ in entry['components']
+            ):
+                known = set(self.registry.keys())
+                self.registry.merge([component for component, _ in entry['components']])
+                self.registry.dependencies.update({
+                    component.key: dependencies for component, dependencies in entry['components']
+                    if component.key not in known and dependencies is not None
+                })
+                for msg in entry['warnings']:
+                    warn(msg)
+                operations.append(entry['operation'])
+                GENERATOR_STATS.operation_cache_hits += 1
+                continue
 
-    def get_schema(self, request=None, public=False):
+            known = set(self.registry.keys())
+            with self.registry.recording() as dependencies, collecting_warnings() as warnings:
+                schema = view.schema
+                self.registry.depend_on(view, schema)
+                operation = schema.get_operation(path, method, self.registry)
+            registered = [k for k in self.registry.keys() if k not in known]
+            cache.store(key, {
+                'operation': operation,
+                'components': list(zip(
+                    self.registry.export(registered),
+                    [self.registry.dependencies.get(k) for k in registered],
+                )),
+                'references': {
+                    k: _get_registered_class_path(self.registry, k) for k in dependencies.components if k in known
+                },
+                'warnings': warnings,
+            }, dependencies.files)
+            operations.append(operation)
+            GENERATOR_STATS.operation_cache_misses += 1
+        return operations
+
+    def _get_operations_sharded(self, endpoints, jobs):
+        """
+        inspect contiguous shards of the endpoints in forked worker processes, each with its
+        own registry. the fragments are merged in shard order, which yields the registration
+        order of serial inspection. components that were resolved differently by a later
+        shard are dropped, together with the new components that only their dropped version
+        leads to. if an operation of that shard directly depends on a dropped component, or
+        still reaches one of those new components, inspection is repeated serially to keep
+        the result identical.
+        """
+        global _sharded_inspection
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            warn('inspection in worker processes requires "fork". inspecting serially instead.')
+            return self._get_operations(endpoints)
+
+        size = math.ceil(len(endpoints) / jobs) or 1
+        shards = [(start, start + size) for start in range(0, len(endpoints), size)]
+        # forked workers must not share the connections of the parent
+        connections.close_all()
+        _sharded_inspection = (self, endpoints)
+        try:
+            with multiprocessing.get_context('fork').Pool(max(len(shards), 1)) as pool:
+                results = pool.map(_inspect_shard, shards)
+        finally:
+            _sharded_inspection = None
+
+        operations = []
+        for shard_operations, fragment, warn_counter, timings in results:
+            GENERATOR_STATS.warn_counter += warn_counter
+            if get_active_profiler():
+                get_active_profiler().merge(timings)
+            known = set(self.registry.keys())
+            diverging = self.registry.merge(fragment)
+            # new components that serial inspection would not reach, as it reuses the registered version
+            orphans = self.registry.get_reachable(
+                [component.schema for component in diverging],
+                components={component.key: component for component in fragment},
+            ) - known
+            if (
+                any(_has_direct_ref(op, component) for op in shard_operations for component in diverging)
+                or orphans & self.registry.get_reachable(shard_operations)
+            ):
+                info('components depend on the inspection order. repeating inspection serially.')
+                reset_generator_stats()
+                self.registry = ComponentRegistry(memo=self.component_memo)
+                return self._get_operations(endpoints)
+            for key in orphans:
+                del self.registry[key]
+            operations.extend(shard_operations)
+        return operations
+
+    def _get_operations_concurrently(self, endpoints, threads):
+        """
+        inspect endpoints on a thread pool. the result is identical to serial inspection,
+        only the order of emitted warnings may differ.
+        """
+        order = RegistrationOrder()
+
+        def get_operation(indexed_endpoint):
+            index, (path, method, view) = indexed_endpoint
+            # views of the same class may share the inspector. use a private copy per thread
+            schema = copy.copy(view.schema)
+            schema.view = view
+            try:
+                with self.registry.inspecting(order, index):
+                    return schema.get_operation(path, method, self.registry)
+            finally:
+                # database connections are per thread
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='drf-spectacular') as executor:
+            return list(executor.map(get_operation, enumerate(endpoints)))
+
+    def get_schema(self, request=None, public=False, jobs=None):
         """ Generate a OpenAPI schema. """
         reset_generator_stats()
-        return build_root_object(
-            paths=self.parse(None if public else request),
-            components=self.registry.build(spectacular_settings.APPEND_COMPONENTS),
-        )
+        paths = self.parse(None if public else request, jobs=jobs)
+        with profile_phase('generator', 'components'):
+            components = self.registry.build(spectacular_settings.APPEND_COMPONENTS)
+        root = build_root_object(paths=paths, components=components)
+        if self._get_endpoint_filters():
+            # only what the subset of endpoints references
+            root = prune_components(root)
+        return root
+
+    @classmethod
+    def get_schemas(cls, urlconfs, request=None, public=False, jobs=None, **kwargs) -> typing.Dict[str, dict]:
+        """
+        Generate the OpenAPI schemas of several urlconfs, e.g. of multiple API versions, in
+        one pass. serializers they have in common are mapped only once, see ComponentMemo.
+        every schema is identical to one generated on its own.
+
+        :param kwargs: passed on to the generator of each urlconf
+        :return: schemas by urlconf, in the given order
+        """
+        component_memo = ComponentMemo()
+        return {
+            urlconf: cls(urlconf=urlconf, component_memo=component_memo, **kwargs).get_schema(
+                request=request, public=public, jobs=jobs
+            )
+            for urlconf in urlconfs
+        }
+
+    def get_schema_stream(self, request=None, public=False, jobs=None) -> dict:
+        """
+        Generate a OpenAPI schema while it is rendered with ``render_stream()`` of the
+        renderers. endpoints are inspected as their paths are written and components are
+        built at the end, so the document is never held as a whole. can be rendered once.
+        """
+        reset_generator_stats()
+        endpoints = self._get_permitted_endpoints(None if public else request)
+        root = build_root_object(paths={}, components={})
+        prune = bool(self._get_endpoint_filters())
+        references = set()
+
+        def iter_path_items():
+            for path, path_item in self._iter_path_items(endpoints, jobs):
+                if prune:
+                    references.update(get_component_references({path: path_item}))
+                yield path, path_item
+
+        def iter_components():
+            components = self.registry.build(spectacular_settings.APPEND_COMPONENTS)
+            if prune:
+                components = prune_components({**root, 'components': components}, references)['components']
+            return components.items()
+
+        root['paths'] = LazyMapping(iter_path_items)
+        root['components'] = LazyMapping(iter_components)
+        return root
+
+
+def _pop_first(mapping):
+    key = next(iter(mapping))
+    return key, mapping.pop(key)
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_urlconf_files(urlconf_module):
+    """ files of the given urlconf module and all modules it includes """
+    files = set()
+    pending = [urlconf_module]
+    while pending:
+        module = pending.pop()
+        if getattr(module, '__file__', None):
+            files.add(module.__file__)
+        for pattern in getattr(module, 'urlpatterns', module):
+            if isinstance(pattern, URLResolver):
+                pending.append(pattern.urlconf_module)
+    return files
+
+
+# generator and endpoints of the running sharded inspection, inherited by forked workers
+_sharded_inspection = None
+
+
+def _inspect_shard(shard):
+    generator, endpoints = _sharded_inspection
+    start, stop = shard
+    reset_generator_stats()
+    generator.registry = ComponentRegistry(memo=generator.component_memo)
+    profiler = get_active_profiler()
+    if profiler:
+        # a copy of the parent's profiler. only report what was measured in this worker
+        profiler.timings = {}
+    operations = list(generator._get_operations(endpoints[start:stop]))
+    timings = profiler.export() if profiler else []
+    return operations, generator.registry.export(), GENERATOR_STATS.warn_counter, timings
+
+
+def _has_direct_ref(operation, component):
+    """ whether the operation's own structure references the component """
+    if isinstance(operation, dict):
+        if operation.get('$ref') == component.ref['$ref']:
+            return True
+        return any(_has_direct_ref(value, component) for value in operation.values())
+    elif isinstance(operation, (list, tuple)):
+        return any(_has_direct_ref(value, component) for value in operation)
+    return False
+
+
+# handlers of serializer field classes per AutoSchema class and field class
+_field_mapping_cache: typing.Dict[tuple, typing.Any] = {}
 
 
 class AutoSchema(ViewInspector):
@@ -117,15 +587,51 @@ class AutoSchema(ViewInspector):
         'patch': 'partial_update',
         'delete': 'destroy',
     }
+    # serializer fields are mapped by the handler of the closest class in their MRO.
+    # see register_field_mapping()
+    field_mappings = {
+        serializers.Serializer: '_map_nested_serializer_field',
+        serializers.ListSerializer: '_map_list_serializer_field',
+        serializers.ManyRelatedField: '_map_many_related_field',
+        serializers.PrimaryKeyRelatedField: '_map_primary_key_related_field',
+        serializers.StringRelatedField: OpenApiTypes.STR,
+        serializers.SlugRelatedField: OpenApiTypes.STR,
+        serializers.HyperlinkedRelatedField: OpenApiTypes.URI,
+        serializers.MultipleChoiceField: '_map_multiple_choice_field',
+        serializers.ChoiceField: '_map_choice_field',
+        serializers.ListField: '_map_list_field',
+        serializers.DateField: OpenApiTypes.DATE,
+        serializers.DateTimeField: OpenApiTypes.DATETIME,
+        serializers.EmailField: OpenApiTypes.EMAIL,
+        serializers.URLField: OpenApiTypes.URI,
+        serializers.UUIDField: OpenApiTypes.UUID,
+        serializers.IPAddressField: '_map_ip_address_field',
+        serializers.DecimalField: '_map_decimal_field',
+        serializers.FloatField: '_map_float_field',
+        serializers.IntegerField: '_map_integer_field',
+        # TODO returns filename. but does it accept binary data on upload?
+        serializers.FileField: OpenApiTypes.STR,
+        serializers.SerializerMethodField: '_map_serializer_method_field',
+        serializers.BooleanField: OpenApiTypes.BOOL,
+        serializers.JSONField: OpenApiTypes.OBJECT,
+        serializers.DictField: OpenApiTypes.OBJECT,
+        serializers.CharField: OpenApiTypes.STR,
+        serializers.ReadOnlyField: '_map_read_only_field',
+    }
 
     def get_operation(self, path, method, registry: ComponentRegistry):
+        with profile_phase('endpoint', f'{method} {path} ({self.view.__class__.__name__})'):
+            return self._get_operation(path, method, registry)
+
+    def _get_operation(self, path, method, registry: ComponentRegistry):
         self.registry = registry
         operation = {}
 
         operation['operationId'] = self.get_operation_id(path, method)
         operation['description'] = self.get_description(path, method)
 
-        parameters = self._get_parameters(path, method)
+        with profile_phase('phase', 'parameters'):
+            parameters = self._get_parameters(path, method)
         if parameters:
             operation['parameters'] = parameters
 
@@ -133,11 +639,13 @@ class AutoSchema(ViewInspector):
         if tags:
             operation['tags'] = tags
 
-        request_body = self._get_request_body(path, method)
+        with profile_phase('phase', 'request body'):
+            request_body = self._get_request_body(path, method)
         if request_body:
             operation['requestBody'] = request_body
 
-        auth = self.get_auth(path, method)
+        with profile_phase('phase', 'auth'):
+            auth = self.get_auth(path, method)
         if auth:
             operation['security'] = auth
 
@@ -145,7 +653,8 @@ class AutoSchema(ViewInspector):
         if deprecated:
             operation['deprecated'] = deprecated
 
-        operation['responses'] = self._get_response_bodies(path, method)
+        with profile_phase('phase', 'responses'):
+            operation['responses'] = self._get_response_bodies(path, method)
 
         return operation
 
@@ -231,17 +740,24 @@ class AutoSchema(ViewInspector):
                 )
                 continue
 
-            auths.append(scheme.get_security_requirement(self.view))
-            component = ResolvedComponent(
-                name=scheme.name,
-                type=ResolvedComponent.SECURITY_SCHEMA,
-                object=authenticator.__class__,
-                schema=scheme.get_security_definition(self.view)
-            )
+            with profile_phase('extension', scheme):
+                auths.append(scheme.get_security_requirement(self.view))
+                component = ResolvedComponent(
+                    name=scheme.name,
+                    type=ResolvedComponent.SECURITY_SCHEMA,
+                    object=authenticator.__class__,
+                    schema=scheme.get_security_definition(self.view)
+                )
+            with self.registry.recording(component.key):
+                self.registry.depend_on(authenticator, scheme)
             if component not in self.registry:
-                self.registry.register(component)
+                self.registry.wait_for_turn()
+                with self.registry.lock:
+                    if component not in self.registry:
+                        self.registry.register(component)
 
         perms = [p.__class__ for p in self.view.get_permissions()]
+        self.registry.depend_on(*perms)
         if permissions.AllowAny in perms:
             auths.append({})
         elif permissions.IsAuthenticatedOrReadOnly in perms and method not in ('PUT', 'PATCH', 'POST'):
@@ -335,7 +851,9 @@ class AutoSchema(ViewInspector):
         if not self._allows_filters(path, method):
             return []
         parameters = []
+        self.registry.depend_on(getattr(self.view, 'filterset_class', None))
         for filter_backend in self.view.filter_backends:
+            self.registry.depend_on(filter_backend)
             parameters += filter_backend().get_schema_operation_parameters(self.view)
         return parameters
 
@@ -417,146 +935,153 @@ class AutoSchema(ViewInspector):
             else:
                 return self._map_serializer_field(method, field._spectacular_annotation)
 
-        # nested serializer
-        if isinstance(field, serializers.Serializer):
-            return self.resolve_serializer(method, field).ref
-
-        # nested serializer with many=True gets automatically replaced with ListSerializer
-        if isinstance(field, serializers.ListSerializer):
-            return build_array_type(self.resolve_serializer(method, field.child).ref)
-
-        # Related fields.
-        if isinstance(field, serializers.ManyRelatedField):
-            return build_array_type(self._map_serializer_field(method, field.child_relation))
-
-        if isinstance(field, serializers.PrimaryKeyRelatedField):
-            # read_only fields do not have a Manager by design. go around and get field
-            # from parent. also avoid calling Manager. __bool__ as it might be customized
-            # to hit the database.
-            if getattr(field, 'queryset', None) is not None:
-                return self._map_model_field(field.queryset.model._meta.pk)
-            else:
-                model = field.parent.Meta.model
-                return self._map_model_field(
-                    get_field_from_model(model, model.id)
-                )
+        # custom fields may be defined outside of the serializer's module
+        self.registry.depend_on(field)
+        handler = self._get_field_mapping(field)
+        if isinstance(handler, OpenApiTypes):
+            return build_basic_type(handler)
+        elif isinstance(handler, str):
+            schema = getattr(self, handler)(method, field)
+        elif handler is not None:
+            schema = handler(self, method, field)
+        else:
+            schema = None
+        if schema is not None:
+            return schema
 
-        if isinstance(field, serializers.StringRelatedField):
-            return build_basic_type(OpenApiTypes.STR)
+        warn(f'could not resolve serializer field {field}. defaulting to "string"')
+        return build_basic_type(OpenApiTypes.STR)
 
-        if isinstance(field, serializers.SlugRelatedField):
-            return build_basic_type(OpenApiTypes.STR)
+    def _get_field_mapping(self, field):
+        """ handler of the closest class in the field's MRO, looked up once per field class """
+        key = (self.__class__, field.__class__)
+        try:
+            return _field_mapping_cache[key]
+        except KeyError:
+            field_mappings = self.field_mappings
+            handler = next((field_mappings[cls] for cls in type(field).__mro__ if cls in field_mappings), None)
+            _field_mapping_cache[key] = handler
+            return handler
+
+    @classmethod
+    def register_field_mapping(cls, field_class, handler=None):
+        """
+        map instances of ``field_class`` and its subclasses with ``handler`` instead of the
+        mapping of a base class. registered on a subclass of AutoSchema, it only applies to
+        that subclass and its subclasses. can be used as decorator of the handler.
 
-        if isinstance(field, serializers.HyperlinkedIdentityField):
-            return build_basic_type(OpenApiTypes.URI)
+        :param handler: :class:`~.types.OpenApiTypes`, the name of an AutoSchema method or
+            a function. methods and functions are called with ``(auto_schema, method, field)``
+            and return the field's schema, or ``None`` if it could not be resolved.
+        """
+        if handler is None:
+            def decorator(f):
+                cls.register_field_mapping(field_class, f)
+                return f
+            return decorator
+        if 'field_mappings' not in vars(cls):
+            cls.field_mappings = dict(cls.field_mappings)
+        cls.field_mappings[field_class] = handler
+        _field_mapping_cache.clear()
+
+    def _map_nested_serializer_field(self, method, field):
+        return self.resolve_serializer(method, field).ref
+
+    def _map_list_serializer_field(self, method, field):
+        # nested serializer with many=True gets automatically replaced with ListSerializer
+        return build_array_type(self.resolve_serializer(method, field.child).ref)
+
+    def _map_many_related_field(self, method, field):
+        return build_array_type(self._map_serializer_field(method, field.child_relation))
+
+    def _map_primary_key_related_field(self, method, field):
+        # read_only fields do not have a Manager by design. go around and get field
+        # from parent. also avoid calling Manager. __bool__ as it might be customized
+        # to hit the database.
+        if getattr(field, 'queryset', None) is not None:
+            self.registry.depend_on(field.queryset.model)
+            return self._map_model_field(field.queryset.model._meta.pk)
+        else:
+            model = field.parent.Meta.model
+            self.registry.depend_on(model)
+            return self._map_model_field(
+                get_field_from_model(model, model.id)
+            )
 
-        if isinstance(field, serializers.HyperlinkedRelatedField):
-            return build_basic_type(OpenApiTypes.URI)
+    def _map_multiple_choice_field(self, method, field):
+        return build_array_type(self._map_choicefield(field))
 
-        # ChoiceFields (single and multiple).
+    def _map_choice_field(self, method, field):
         # Q:
         # - Is 'type' required?
         # - can we determine the TYPE of a choicefield?
-        if isinstance(field, serializers.MultipleChoiceField):
-            return build_array_type(self._map_choicefield(field))
-
-        if isinstance(field, serializers.ChoiceField):
-            return self._map_choicefield(field)
-
-        if isinstance(field, serializers.ListField):
-            schema = build_array_type({})
-            # TODO check this
-            if not isinstance(field.child, _UnvalidatedField):
-                map_field = self._map_serializer_field(method, field.child)
-                items = {
-                    "type": map_field.get('type')
-                }
-                if 'format' in map_field:
-                    items['format'] = map_field.get('format')
-                schema['items'] = items
-            return schema
-
-        # DateField and DateTimeField type is string
-        if isinstance(field, serializers.DateField):
-            return build_basic_type(OpenApiTypes.DATE)
-
-        if isinstance(field, serializers.DateTimeField):
-            return build_basic_type(OpenApiTypes.DATETIME)
-
-        if isinstance(field, serializers.EmailField):
-            return build_basic_type(OpenApiTypes.EMAIL)
-
-        if isinstance(field, serializers.URLField):
-            return build_basic_type(OpenApiTypes.URI)
-
-        if isinstance(field, serializers.UUIDField):
-            return build_basic_type(OpenApiTypes.UUID)
-
-        if isinstance(field, serializers.IPAddressField):
-            # TODO this might be a DRF bug. protocol is not propagated to serializer although it
-            #  should have been. results in always 'both' (thus no format)
-            if 'ipv4' == field.protocol.lower():
-                return build_basic_type(OpenApiTypes.IP4)
-            elif 'ipv6' == field.protocol.lower():
-                return build_basic_type(OpenApiTypes.IP6)
-            else:
-                return build_basic_type(OpenApiTypes.STR)
-
-        # DecimalField has multipleOf based on decimal_places
-        if isinstance(field, serializers.DecimalField):
-            content = {
-                'type': 'number'
+        return self._map_choicefield(field)
+
+    def _map_list_field(self, method, field):
+        schema = build_array_type({})
+        # TODO check this
+        if not isinstance(field.child, _UnvalidatedField):
+            map_field = self._map_serializer_field(method, field.child)
+            items = {
+                "type": map_field.get('type')
             }
-            if field.decimal_places:
-                content['multipleOf'] = float('.' + (field.decimal_places - 1) * '0' + '1')
-            if field.max_whole_digits:
-                content['maximum'] = int(field.max_whole_digits * '9') + 1
-                content['minimum'] = -content['maximum']
-            self._map_min_max(field, content)
-            return content
-
-        if isinstance(field, serializers.FloatField):
-            content = build_basic_type(OpenApiTypes.FLOAT)
-            self._map_min_max(field, content)
-            return content
-
-        if isinstance(field, serializers.IntegerField):
-            content = build_basic_type(OpenApiTypes.INT)
-            self._map_min_max(field, content)
-            # 2147483647 is max for int32_size, so we use int64 for format
-            if int(content.get('maximum', 0)) > 2147483647 or int(content.get('minimum', 0)) > 2147483647:
-                content['format'] = 'int64'
-            return content
-
-        if isinstance(field, serializers.FileField):
-            # TODO returns filename. but does it accept binary data on upload?
-            return build_basic_type(OpenApiTypes.STR)
-
-        if isinstance(field, serializers.SerializerMethodField):
-            method = getattr(field.parent, field.method_name)
-            return self._map_type_hint(method)
-
-        if isinstance(field, serializers.BooleanField):
-            return build_basic_type(OpenApiTypes.BOOL)
-
-        if anyisinstance(field, [serializers.JSONField, serializers.DictField, serializers.HStoreField]):
-            return build_basic_type(OpenApiTypes.OBJECT)
-
-        if isinstance(field, serializers.CharField):
+            if 'format' in map_field:
+                items['format'] = map_field.get('format')
+            schema['items'] = items
+        return schema
+
+    def _map_ip_address_field(self, method, field):
+        # TODO this might be a DRF bug. protocol is not propagated to serializer although it
+        #  should have been. results in always 'both' (thus no format)
+        if 'ipv4' == field.protocol.lower():
+            return build_basic_type(OpenApiTypes.IP4)
+        elif 'ipv6' == field.protocol.lower():
+            return build_basic_type(OpenApiTypes.IP6)
+        else:
             return build_basic_type(OpenApiTypes.STR)
 
-        if isinstance(field, serializers.ReadOnlyField):
-            # direct source from the serializer
-            assert field.source_attrs, 'ReadOnlyField needs a proper source'
-            target = follow_field_source(field.parent.Meta.model, field.source_attrs)
-
-            if callable(target):
-                return self._map_type_hint(target)
-            elif isinstance(target, models.Field):
-                return self._map_model_field(target)
-
-        warn(f'could not resolve serializer field {field}. defaulting to "string"')
-        return build_basic_type(OpenApiTypes.STR)
+    def _map_decimal_field(self, method, field):
+        # DecimalField has multipleOf based on decimal_places
+        content = {
+            'type': 'number'
+        }
+        if field.decimal_places:
+            content['multipleOf'] = float('.' + (field.decimal_places - 1) * '0' + '1')
+        if field.max_whole_digits:
+            content['maximum'] = int(field.max_whole_digits * '9') + 1
+            content['minimum'] = -content['maximum']
+        self._map_min_max(field, content)
+        return content
+
+    def _map_float_field(self, method, field):
+        content = build_basic_type(OpenApiTypes.FLOAT)
+        self._map_min_max(field, content)
+        return content
+
+    def _map_integer_field(self, method, field):
+        content = build_basic_type(OpenApiTypes.INT)
+        self._map_min_max(field, content)
+        # 2147483647 is max for int32_size, so we use int64 for format
+        if int(content.get('maximum', 0)) > 2147483647 or int(content.get('minimum', 0)) > 2147483647:
+            content['format'] = 'int64'
+        return content
+
+    def _map_serializer_method_field(self, method, field):
+        method = getattr(field.parent, field.method_name)
+        return self._map_type_hint(method)
+
+    def _map_read_only_field(self, method, field):
+        # direct source from the serializer
+        assert field.source_attrs, 'ReadOnlyField needs a proper source'
+        target = follow_field_source(field.parent.Meta.model, field.source_attrs)
+        # the source may lead through related models
+        self.registry.depend_on(getattr(target, 'model', None))
+
+        if callable(target):
+            return self._map_type_hint(target)
+        elif isinstance(target, models.Field):
+            return self._map_model_field(target)
+        return None
 
     def _map_min_max(self, field, content):
         if field.max_value:
@@ -567,9 +1092,12 @@ class AutoSchema(ViewInspector):
     def _map_serializer(self, method, serializer):
         serializer = force_instance(serializer)
         serializer_extension = OpenApiSerializerExtension.get_match(serializer)
+        model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+        self.registry.depend_on(serializer, model, serializer_extension)
 
         if serializer_extension:
-            return serializer_extension.map_serializer(self, method)
+            with profile_phase('extension', serializer_extension):
+                return serializer_extension.map_serializer(self, method)
         else:
             return self._map_basic_serializer(method, serializer)
 
@@ -649,8 +1177,10 @@ class AutoSchema(ViewInspector):
 
     def _map_type_hint(self, method):
         hint = getattr(method, '_spectacular_annotation', None) or typing.get_type_hints(method).get('return')
+        self.registry.depend_on(method)
 
         if is_serializer(hint) or is_field(hint):
+            self.registry.depend_on(hint)
             return self._map_serializer_field(method, force_instance(hint))
         elif is_basic_type(hint):
             return build_basic_type(hint)
@@ -668,15 +1198,18 @@ class AutoSchema(ViewInspector):
 
     def _get_paginator(self):
         pagination_class = getattr(self.view, 'pagination_class', None)
+        self.registry.depend_on(pagination_class)
         if pagination_class:
             return pagination_class()
         return None
 
     def map_parsers(self, path, method):
+        self.registry.depend_on(*self.view.parser_classes)
         return list(map(attrgetter('media_type'), self.view.parser_classes))
 
     def map_renderers(self, path, method):
         media_types = []
+        self.registry.depend_on(*self.view.renderer_classes)
         for renderer in self.view.renderer_classes:
             # BrowsableAPIRenderer not relevant to OpenAPI spec
             if renderer == renderers.BrowsableAPIRenderer:
@@ -830,16 +1363,33 @@ class AutoSchema(ViewInspector):
             type=ResolvedComponent.SCHEMA,
             object=serializer,
         )
-        if component in self.registry:
-            return self.registry[component]  # return component with schema
-
-        self.registry.register(component)
-        component.schema = self._map_serializer(method, serializer)
-        # 3 cases:
-        #   1. polymorphic container component -> use
-        #   2. concrete component with properties -> use
-        #   3. concrete component without properties -> prob. transactional so discard
-        if 'oneOf' not in component.schema and not component.schema['properties']:
-            del self.registry[component]
-            return ResolvedComponent(None, None)  # sentinel
-        return component
+        with self.registry.lock:
+            if component in self.registry:
+                return self.registry[component]  # return component with schema
+
+        if self.registry.wait_for_turn():
+            # inspected concurrently. a previous endpoint might have registered it meanwhile
+            return self.resolve_serializer(method, serializer)
+
+        with self.registry.lock:
+            # recorded dependencies of memoized components would be incomplete
+            memo = None if self.registry.is_recording() else self.registry.memo
+            memo_key = memo.get_key(component, method, self) if memo else None
+            if memo and memo.replay(memo_key, self.registry):
+                return self.registry[component]
+
+            known = set(self.registry.keys())
+            self.registry.register(component)
+            with self.registry.recording(component.key), profile_phase('serializer', component.name), \
+                    collecting_warnings() as warnings:
+                component.schema = self._map_serializer(method, serializer)
+            # 3 cases:
+            #   1. polymorphic container component -> use
+            #   2. concrete component with properties -> use
+            #   3. concrete component without properties -> prob. transactional so discard
+            if 'oneOf' not in component.schema and not component.schema['properties']:
+                del self.registry[component]
+                return ResolvedComponent(None, None)  # sentinel
+            if memo:
+                memo.store(memo_key, self.registry, [k for k in self.registry.keys() if k not in known], warnings)
+            return component
@@ -1,9 +1,15 @@
+import functools
+import hashlib
 import inspect
+import json
+import re
 import sys
+import threading
 from abc import ABCMeta
 from collections import defaultdict
 from collections.abc import Hashable
-from typing import List, Type, Optional, TypeVar, Union, Generic
+from contextlib import contextmanager
+from typing import Dict, List, Set, Tuple, Type, Optional, TypeVar, Union, Generic
 
 from django import __version__ as DJANGO_VERSION
 from django.utils.module_loading import import_string
@@ -17,18 +23,48 @@ T = TypeVar('T')
 
 class GeneratorStats:
     warn_counter = 0
+    # operations loaded from and inspected despite of GENERATOR_CACHE_DIR
+    operation_cache_hits = 0
+    operation_cache_misses = 0
+    # duration in seconds of the last schema cache warm-up
+    warmup_duration = None
 
 
 GENERATOR_STATS = GeneratorStats()
+_warn_lock = threading.Lock()
+_warn_local = threading.local()
 
 
 def warn(msg):
-    GENERATOR_STATS.warn_counter += 1
-    print(f'WARNING #{GENERATOR_STATS.warn_counter}: {msg}', file=sys.stderr)
+    with _warn_lock:
+        GENERATOR_STATS.warn_counter += 1
+        print(f'WARNING #{GENERATOR_STATS.warn_counter}: {msg}', file=sys.stderr)
+    collected = getattr(_warn_local, 'collected', None)
+    if collected is not None:
+        collected.append(msg)
+
+
+@contextmanager
+def collecting_warnings():
+    """ collect the messages of the warnings emitted by the current thread within the block """
+    outer = getattr(_warn_local, 'collected', None)
+    _warn_local.collected = collected = []
+    try:
+        yield collected
+    finally:
+        _warn_local.collected = outer
+        if outer is not None:
+            outer.extend(collected)
+
+
+def info(msg):
+    print(f'INFO: {msg}', file=sys.stderr)
 
 
 def reset_generator_stats():
     GENERATOR_STATS.warn_counter = 0
+    GENERATOR_STATS.operation_cache_hits = 0
+    GENERATOR_STATS.operation_cache_misses = 0
 
 
 def anyisinstance(obj, type_list):
@@ -151,6 +187,144 @@ def build_root_object(paths, components):
     return root
 
 
+OPENAPI_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch', 'trace')
+
+
+def _iter_operations(paths):
+    for path_item in paths.values():
+        for method, operation in path_item.items():
+            if method in OPENAPI_METHODS:
+                yield operation
+
+
+def _iter_refs(obj):
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key == '$ref' and isinstance(value, str):
+                yield value
+            else:
+                yield from _iter_refs(value)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            yield from _iter_refs(value)
+
+
+def get_component_references(paths) -> Set[Tuple[str, str]]:
+    """
+    ``(component type, name)`` of the components that the path items reference directly,
+    including the security schemes required by their operations
+    """
+    references = set(_iter_component_keys(paths))
+    for operation in _iter_operations(paths):
+        for requirement in operation.get('security', []):
+            references.update(('securitySchemes', name) for name in requirement)
+    return references
+
+
+def _iter_component_keys(obj):
+    for ref in _iter_refs(obj):
+        if ref.startswith('#/components/') and ref.count('/') == 3:
+            yield tuple(ref.split('/')[2:])
+
+
+def prune_components(schema, references=None) -> dict:
+    """
+    shallow copy of the root object that only contains components which are referenced
+    from paths, either directly or through other components. security schemes are kept
+    if they are required by an operation or the root object.
+
+    :param references: direct references of paths that are no longer at hand, e.g. because
+        they were streamed. see :func:`get_component_references`
+    """
+    components = schema.get('components', {})
+    if references is None:
+        references = get_component_references(schema.get('paths', {}))
+    used = set()
+    for requirement in schema.get('security', []):
+        used.update(('securitySchemes', name) for name in requirement)
+
+    pending = list(references)
+    while pending:
+        component_type, name = pending.pop()
+        if (component_type, name) in used or name not in components.get(component_type, {}):
+            continue
+        used.add((component_type, name))
+        pending.extend(_iter_component_keys(components[component_type][name]))
+
+    pruned_components = {}
+    for component_type, component_dict in components.items():
+        pruned = {name: s for name, s in component_dict.items() if (component_type, name) in used}
+        if pruned:
+            pruned_components[component_type] = pruned
+    return {**schema, 'components': pruned_components}
+
+
+def get_schema_tags(schema) -> Dict[str, int]:
+    """ tags used by the operations in order of first appearance, with their number of operations """
+    tags = {}
+    for operation in _iter_operations(schema.get('paths', {})):
+        for tag in operation.get('tags', []):
+            tags[tag] = tags.get(tag, 0) + 1
+    return tags
+
+
+def filter_schema_by_tags(schema, tags) -> dict:
+    """
+    self-contained sub-schema with only the operations tagged with any of ``tags`` and the
+    components they need. unchanged objects are shared with ``schema`` instead of copied.
+    """
+    tags = set(tags)
+    sub_schema = _filter_operations(
+        schema, lambda path, method, operation: tags.intersection(operation.get('tags', []))
+    )
+    if 'tags' in schema:
+        sub_schema['tags'] = [tag for tag in schema['tags'] if tag.get('name') in tags]
+    return prune_components(sub_schema)
+
+
+def filter_schema_by_operations(schema, operations, keep_paths=()) -> dict:
+    """
+    self-contained sub-schema with only the given operations and the components they need.
+    unchanged objects are shared with ``schema`` instead of copied.
+
+    :param operations: ``(path, method)`` of the operations to keep, as in the schema
+    :param keep_paths: paths that are kept as a whole, e.g. APPEND_PATHS
+    """
+    operations = set(operations)
+    keep_paths = set(keep_paths)
+    return prune_components(_filter_operations(
+        schema, lambda path, method, operation: path in keep_paths or (path, method) in operations
+    ))
+
+
+def _filter_operations(schema, predicate) -> dict:
+    paths = {}
+    for path, path_item in schema.get('paths', {}).items():
+        operations = {
+            method: operation for method, operation in path_item.items()
+            if method in OPENAPI_METHODS and predicate(path, method, operation)
+        }
+        if operations:
+            paths[path] = {
+                key: value for key, value in path_item.items()
+                if key in operations or key not in OPENAPI_METHODS
+            }
+    return {**schema, 'paths': paths}
+
+
+class LazyMapping:
+    """
+    stand-in for a mapping whose items are only produced while it is rendered with
+    ``render_stream()``, e.g. paths while their endpoints are inspected. single use.
+    """
+
+    def __init__(self, produce_items):
+        self._produce_items = produce_items
+
+    def items(self):
+        return self._produce_items()
+
+
 def get_field_from_model(model, field):
     """
     this is a Django 2.2 compatibility function to access a field through a Deferred Attribute
@@ -213,6 +387,96 @@ def alpha_operation_sorter(endpoint):
     return path, method_priority
 
 
+class EndpointFilter:
+    """
+    include and exclude patterns for endpoints, given as dicts that map ``path``, ``method``
+    and ``view_module`` to lists of regular expressions. an endpoint is included if it
+    matches at least one include pattern of every given kind and no exclude pattern. paths
+    (as in the urlconf) and view modules are matched from their start, methods as a whole
+    and case-insensitively. only needs the callback, so no view is created for filtering.
+
+    with ``globs``, patterns are plain strings in which only ``*`` is special and matches
+    any characters. paths and view modules are still matched from their start. matching
+    takes at most ``len(pattern) * len(value)`` steps, which makes globs safe for
+    untrusted input, e.g. query parameters.
+    """
+    KINDS = ('path', 'method', 'view_module')
+
+    def __init__(self, include=None, exclude=None, globs=False):
+        self.globs = globs
+        self.include = self._compile(include)
+        self.exclude = self._compile(exclude)
+
+    def _compile(self, patterns):
+        patterns = patterns or {}
+        unknown = set(patterns) - set(self.KINDS)
+        if unknown:
+            raise ValueError(f'unknown endpoint filter kinds {sorted(unknown)}. choose from {self.KINDS}')
+        if self.globs:
+            return {
+                kind: [pattern.upper() if kind == 'method' else pattern for pattern in kind_patterns]
+                for kind, kind_patterns in patterns.items() if kind_patterns
+            }
+        return {
+            kind: [re.compile(pattern, re.IGNORECASE if kind == 'method' else 0) for pattern in kind_patterns]
+            for kind, kind_patterns in patterns.items() if kind_patterns
+        }
+
+    def __bool__(self):
+        return bool(self.include or self.exclude)
+
+    def get_fingerprint(self) -> str:
+        """ identifies the patterns, e.g. for keying cached schemas of the subset """
+        patterns = [
+            {
+                kind: sorted(p if self.globs else p.pattern for p in kind_patterns)
+                for kind, kind_patterns in sorted(patterns.items())
+            }
+            for patterns in (self.include, self.exclude)
+        ]
+        return hashlib.sha256(json.dumps([self.globs, patterns]).encode()).hexdigest()[:16]
+
+    def matches(self, path, method, callback) -> bool:
+        values = {
+            'path': path,
+            'method': method.upper(),
+            'view_module': getattr(callback, 'cls', callback).__module__,
+        }
+        for kind, kind_patterns in self.include.items():
+            if not any(self._match(kind, pattern, values[kind]) for pattern in kind_patterns):
+                return False
+        for kind, kind_patterns in self.exclude.items():
+            if any(self._match(kind, pattern, values[kind]) for pattern in kind_patterns):
+                return False
+        return True
+
+    def _match(self, kind, pattern, value):
+        if self.globs:
+            return _match_glob(pattern if kind == 'method' else pattern + '*', value)
+        return pattern.fullmatch(value) if kind == 'method' else pattern.match(value)
+
+
+def _match_glob(pattern, value) -> bool:
+    """ whether ``value`` as a whole matches ``pattern``, where ``*`` matches any characters """
+    p = v = 0
+    # position of the last ``*`` in pattern and of the value character it currently ends at
+    star, star_end = -1, 0
+    while v < len(value):
+        if p < len(pattern) and pattern[p] == '*':
+            star, star_end = p, v
+            p += 1
+        elif p < len(pattern) and pattern[p] == value[v]:
+            p += 1
+            v += 1
+        elif star >= 0:
+            # let the last ``*`` match one more character and retry from there
+            star_end += 1
+            p, v = star + 1, star_end
+        else:
+            return False
+    return all(c == '*' for c in pattern[p:])
+
+
 class ResolvedComponent:
     SCHEMA = 'schemas'
     SECURITY_SCHEMA = 'securitySchemes'
@@ -236,9 +500,151 @@ class ResolvedComponent:
         return {'$ref': f'#/components/{self.type}/{self.name}'}
 
 
-class ComponentRegistry:
+def _warn_name_collision(name, query_class, registry_class):
+    warn(
+        f'Encountered 2 components with identical names "{name}" and '
+        f'different classes {query_class} and {registry_class}. This will very '
+        f'likely result in an incorrect schema. Try renaming one.'
+    )
+
+
+def _get_class_path(obj) -> str:
+    if isinstance(obj, str):
+        return obj
+    cls = get_class(obj)
+    return f"<class '{cls.__module__}.{cls.__qualname__}'>"
+
+
+class RegistrationOrder:
+    """
+    lets endpoints that are inspected concurrently register new components strictly in
+    endpoint order. every component is thus resolved by the same endpoint (and in the same
+    context) as with serial inspection, which makes the outcome identical.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._finished = set()
+        self._next = 0
+
+    def wait(self, index) -> bool:
+        with self._condition:
+            if self._next >= index:
+                return False
+            self._condition.wait_for(lambda: self._next >= index)
+            return True
+
+    def finish(self, index):
+        with self._condition:
+            self._finished.add(index)
+            while self._next in self._finished:
+                self._next += 1
+            self._condition.notify_all()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_source_files(cls) -> frozenset:
+    """ files of the modules that define the class and its bases """
+    files = set()
+    for base in inspect.getmro(cls):
+        module = sys.modules.get(base.__module__)
+        if getattr(module, '__file__', None):
+            files.add(module.__file__)
+    return frozenset(files)
+
+
+class Dependencies:
+    """ source files and components that an operation or a component was derived from """
+
+    def __init__(self):
+        self.files = set()
+        # component keys in order of first lookup. dict as ordered set
+        self.components = {}
+
+    def update(self, other: 'Dependencies'):
+        self.files.update(other.files)
+        self.components.update(other.components)
+
+
+class ComponentMemo:
+    """
+    serializer schemas shared between the registries of several generators, e.g. of
+    different urlconfs with common serializers. a serializer is mapped once per AutoSchema
+    class and method. the components registered while mapping it are replayed into the
+    other registries, so every schema equals one of a separate generation. only valid while
+    settings and source files are unchanged, i.e. for one batch of generations.
+    """
+
     def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, component: 'ResolvedComponent', method, auto_schema) -> tuple:
+        """ everything a serializer schema depends on besides settings and source files """
+        # classes created by @extend_schema only override operation-level methods
+        schema_classes = tuple(
+            cls for cls in type(auto_schema).__mro__ if '_spectacular_operation' not in vars(cls)
+        )
+        return component.key, _get_class_path(component.object), method, schema_classes
+
+    def replay(self, key, registry: 'ComponentRegistry') -> bool:
+        """
+        register the components memoized for ``key`` unless already registered and repeat
+        their warnings. the components they reference must resolve just like at the time
+        of mapping, otherwise mapping them again could differ. the same goes for components
+        of the entry that are already registered with another schema, as mapping reuses them.
+
+        :return: whether there was a usable entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or any(
+            _get_registered_class_path(registry, ref_key) != class_path
+            for ref_key, class_path in entry['references'].items()
+        ) or any(
+            c.key in registry.keys() and (
+                _get_registered_class_path(registry, c.key) != c.object or registry[c.key].schema != c.schema
+            )
+            for c in entry['components']
+        ):
+            self.misses += 1
+            return False
+        registry.merge([ResolvedComponent(c.name, c.type, c.schema, c.object) for c in entry['components']])
+        for msg in entry['warnings']:
+            warn(msg)
+        self.hits += 1
+        return True
+
+    def store(self, key, registry: 'ComponentRegistry', keys, warnings):
+        """ memoize the components of ``keys``, which were registered while mapping ``key`` """
+        components = registry.export(keys)
+        registered = set(keys)
+        references = {
+            (name, component_type): _get_registered_class_path(registry, (name, component_type))
+            for component in components
+            for component_type, name in _iter_component_keys(component.schema)
+            if (name, component_type) not in registered
+        }
+        with self._lock:
+            self._entries[key] = {'components': components, 'references': references, 'warnings': warnings}
+
+
+def _get_registered_class_path(registry, key) -> Optional[str]:
+    return _get_class_path(registry[key].object) if key in registry.keys() else None
+
+
+class ComponentRegistry:
+    def __init__(self, memo: Optional[ComponentMemo] = None):
         self._components = {}
+        # serializer schemas shared with the registries of other generators
+        self.memo = memo
+        # held while resolving a component so that concurrent inspection resolves it once
+        self.lock = threading.RLock()
+        self._local = threading.local()
+        # dependencies of components, only collected while recording
+        self.dependencies: Dict[tuple, Dependencies] = {}
 
     def register(self, component: ResolvedComponent):
         if self._components.get(component.key, None):
@@ -250,22 +656,27 @@ class ComponentRegistry:
         self._components[component.key] = component
 
     def __contains__(self, component):
+        recording = getattr(self._local, 'recording', None)
+        if recording is not None:
+            recording.components[component.key] = None
+            if component.key in self.dependencies:
+                recording.update(self.dependencies[component.key])
+
         if component.key not in self._components:
             return False
 
-        query_obj = component.object
-        registry_obj = self._components[component.key].object
-        query_class = query_obj if inspect.isclass(query_obj) else query_obj.__class__
-        registry_class = query_obj if inspect.isclass(registry_obj) else registry_obj.__class__
+        # compare by path as components loaded from an export only know the path of their class
+        query_class = _get_class_path(component.object)
+        registry_class = _get_class_path(self._components[component.key].object)
 
         if query_class != registry_class:
-            warn(
-                f'Encountered 2 components with identical names "{component.name}" and '
-                f'different classes {query_class} and {registry_class}. This will very '
-                f'likely result in an incorrect schema. Try renaming one.'
-            )
+            _warn_name_collision(component.name, query_class, registry_class)
         return True
 
+    def keys(self):
+        """ live view of the keys of the registered components in order of registration """
+        return self._components.keys()
+
     def __getitem__(self, key):
         if isinstance(key, ResolvedComponent):
             key = key.key
@@ -276,6 +687,111 @@ class ComponentRegistry:
             key = key.key
         del self._components[key]
 
+    @contextmanager
+    def recording(self, key=None):
+        """
+        collect the :class:`Dependencies` of everything inspected within the block. they
+        are added to an enclosing recording as well. with ``key`` they are kept as the
+        dependencies of that component. nested blocks only record if there is an outer one.
+        """
+        outer = getattr(self._local, 'recording', None)
+        if key is not None and outer is None:
+            yield None
+            return
+        self._local.recording = dependencies = Dependencies()
+        try:
+            yield dependencies
+        finally:
+            self._local.recording = outer
+            if key is not None:
+                self.dependencies[key] = dependencies
+            if outer is not None:
+                outer.update(dependencies)
+
+    def is_recording(self) -> bool:
+        return getattr(self._local, 'recording', None) is not None
+
+    def depend_on(self, *objs):
+        """ record the source files of the given classes, instances or functions, if recording """
+        recording = getattr(self._local, 'recording', None)
+        if recording is not None:
+            for obj in objs:
+                if obj is None:
+                    continue
+                elif inspect.isroutine(obj):
+                    module = sys.modules.get(getattr(obj, '__module__', None) or '')
+                    if getattr(module, '__file__', None):
+                        recording.files.add(module.__file__)
+                else:
+                    recording.files.update(_get_source_files(get_class(obj)))
+
+    def export(self, keys=None) -> List[ResolvedComponent]:
+        """
+        picklable copy of the registered components (or only the given ones) with classes
+        replaced by their path
+        """
+        components = self._components.values() if keys is None else [self._components[key] for key in keys]
+        return [
+            ResolvedComponent(c.name, c.type, schema=c.schema, object=_get_class_path(c.object))
+            for c in components
+        ]
+
+    def merge(self, fragment: List[ResolvedComponent]) -> List[ResolvedComponent]:
+        """
+        register the components of an exported fragment unless already registered. name
+        collisions between different classes are reported just like with :meth:`__contains__`.
+
+        :return: components for which the fragment holds a different schema than the registry
+        """
+        diverging = []
+        for component in fragment:
+            registered = self._components.get(component.key)
+            if registered is None:
+                self._components[component.key] = component
+            elif _get_class_path(registered.object) != component.object:
+                _warn_name_collision(component.name, component.object, _get_class_path(registered.object))
+            elif registered.schema != component.schema:
+                diverging.append(component)
+        return diverging
+
+    def get_reachable(self, obj, components=None) -> Set[tuple]:
+        """
+        keys of the components that ``obj`` references, directly or through other components.
+        references are followed through the registered components or the given ones.
+        """
+        components = self._components if components is None else components
+        reachable = set()
+        pending = [(name, component_type) for component_type, name in _iter_component_keys(obj)]
+        while pending:
+            key = pending.pop()
+            if key in reachable or key not in components:
+                continue
+            reachable.add(key)
+            pending.extend((name, component_type) for component_type, name in _iter_component_keys(
+                components[key].schema
+            ))
+        return reachable
+
+    @contextmanager
+    def inspecting(self, order: 'RegistrationOrder', index: int):
+        """ block in which the current thread concurrently inspects the endpoint ``index`` """
+        self._local.turn = (order, index)
+        try:
+            yield
+        finally:
+            self._local.turn = None
+            order.finish(index)
+
+    def wait_for_turn(self) -> bool:
+        """
+        with concurrent inspection, block until all previous endpoints are inspected. must be
+        called before registering a new component and without holding :attr:`lock`.
+
+        :return: whether the current thread had to wait
+        """
+        turn = getattr(self._local, 'turn', None)
+        return turn[0].wait(turn[1]) if turn else False
+
     def build(self, extra_components) -> dict:
         output = defaultdict(dict)
         # build tree from flat registry
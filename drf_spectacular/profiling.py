@@ -0,0 +1,251 @@
+import gc
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from drf_spectacular.plumbing import _get_class_path
+
+# per-thread cpu time is only available with python>=3.7
+_cpu_time = getattr(time, 'thread_time', time.process_time)
+
+# profiler that phases are currently recorded with, see GenerationProfiler
+_active_profiler: Optional['GenerationProfiler'] = None
+
+
+class Timing:
+    __slots__ = ('calls', 'wall', 'cpu')
+
+    def __init__(self, calls=0, wall=0.0, cpu=0.0):
+        self.calls = calls
+        self.wall = wall
+        self.cpu = cpu
+
+
+class GenerationProfiler:
+    """
+    records wall and cpu time of everything measured with :func:`profile_phase` while it is
+    active. covers endpoints, the phases of ``AutoSchema.get_operation``, serializer
+    resolution and extensions. times are inclusive, e.g. the request body phase contains
+    the resolution of its serializer.
+
+    .. code-block:: python
+
+        with GenerationProfiler() as profiler:
+            generator.get_schema(request=None, public=True)
+        print(profiler.get_report(top=20))
+    """
+
+    def __init__(self):
+        self.timings: Dict[Tuple[str, str], Timing] = {}
+        self._lock = threading.Lock()
+        self._outer = None
+        self._start = None
+        self.wall = 0.0
+
+    def __enter__(self):
+        global _active_profiler
+        self._outer, _active_profiler = _active_profiler, self
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _active_profiler
+        self.wall += time.perf_counter() - self._start
+        _active_profiler = self._outer
+
+    def record(self, kind, name, wall, cpu, calls=1):
+        with self._lock:
+            timing = self.timings.setdefault((kind, name), Timing())
+            timing.calls += calls
+            timing.wall += wall
+            timing.cpu += cpu
+
+    def export(self) -> List[list]:
+        """ picklable copy of the timings, see :meth:`merge` """
+        return [[kind, name, t.calls, t.wall, t.cpu] for (kind, name), t in self.timings.items()]
+
+    def merge(self, exported):
+        """ add timings exported by another profiler, e.g. in a worker process """
+        for kind, name, calls, wall, cpu in exported:
+            self.record(kind, name, wall, cpu, calls=calls)
+
+    def get_entries(self, top=None, kind=None) -> List[dict]:
+        """ timings sorted by wall time, optionally only the ``top`` ones of the given ``kind`` """
+        entries = [
+            {'kind': k, 'name': name, 'calls': t.calls, 'wall': t.wall, 'cpu': t.cpu}
+            for (k, name), t in self.timings.items() if kind is None or k == kind
+        ]
+        entries.sort(key=lambda entry: entry['wall'], reverse=True)
+        return entries[:top] if top else entries
+
+    def as_dict(self, top=None) -> dict:
+        """ JSON-serializable report, e.g. for tracking generation times over time """
+        return {'wall': self.wall, 'entries': self.get_entries(top)}
+
+    def get_report(self, top=20) -> str:
+        """ human readable report of the ``top`` entries per kind """
+        lines = [f'profiled {self.wall * 1000:.1f}ms (wall) in total. times include nested phases.']
+        for kind in sorted({kind for kind, _ in self.timings}):
+            lines.append('')
+            lines.append(f'{"wall [ms]":>10} {"cpu [ms]":>10} {"calls":>6}  {kind}')
+            for entry in self.get_entries(top, kind):
+                wall, cpu = entry['wall'] * 1000, entry['cpu'] * 1000
+                lines.append(f'{wall:>10.1f} {cpu:>10.1f} {entry["calls"]:>6}  {entry["name"]}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def profile_phase(kind, name):
+    """
+    measure the block with the active :class:`GenerationProfiler`, if there is one. objects
+    other than strings are named after their class, e.g. extensions.
+    """
+    profiler = _active_profiler
+    if profiler is None:
+        yield
+        return
+    if not isinstance(name, str):
+        name = f'{name.__class__.__module__}.{name.__class__.__qualname__}'
+    wall, cpu = time.perf_counter(), _cpu_time()
+    try:
+        yield
+    finally:
+        profiler.record(kind, name, time.perf_counter() - wall, _cpu_time() - cpu)
+
+
+def get_active_profiler() -> Optional[GenerationProfiler]:
+    return _active_profiler
+
+
+def _format_size(size) -> str:
+    return f'{size / 1024 / 1024:>9.2f}MB'
+
+
+class MemoryProfiler:
+    """
+    traces allocations with ``tracemalloc`` while active. reports the peak, the retained
+    and peak memory of phases measured with :meth:`phase`, the memory freed by releasing
+    groups of objects with :meth:`release` and the biggest retained allocation sites at
+    the time of :meth:`take_snapshot`.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, Tuple[int, int]] = {}
+        self.groups: Dict[str, Tuple[int, int]] = {}
+        self.snapshot = None
+        self.peak = 0
+        self._started = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        self._baseline = tracemalloc.get_traced_memory()[0]
+        self._reset_peak()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1] - self._baseline)
+        if self._started:
+            tracemalloc.stop()
+
+    def _reset_peak(self):
+        # only available with python>=3.9. peaks of phases include previous phases otherwise
+        if hasattr(tracemalloc, 'reset_peak'):
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1] - self._baseline)
+            tracemalloc.reset_peak()
+
+    @contextmanager
+    def phase(self, name):
+        """ record memory retained after the block and the peak within, relative to its start """
+        self._reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            self.phases[name] = (current - before, peak - before)
+
+    def release(self, name, release):
+        """
+        record the memory that is freed by calling ``release``, which drops references and
+        returns the number of objects it dropped. only memory that nothing else retains is
+        freed, so every block is counted for at most one group.
+        """
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        count = release()
+        gc.collect()
+        self.groups[name] = (count, before - tracemalloc.get_traced_memory()[0])
+
+    def release_generator(self, generator, schema, label=''):
+        """
+        record what the generator and its schema retain by releasing them group by group.
+        the generator keeps no views itself. they are retained through the context of the
+        serializers in the registry and released first. both are unusable afterwards.
+        """
+        registry = generator.registry
+
+        def get_serializers():
+            components = (registry[key] for key in registry.keys())
+            return [c for c in components if not isinstance(c.object, (type, str))]
+
+        def release_views():
+            roots = {id(c.object.root): c.object.root for c in get_serializers()}
+            views = {id(root.context['view']) for root in roots.values() if root.context.get('view')}
+            for root in roots.values():
+                # the context is also kept in the constructor kwargs of the serializer
+                root.__dict__.pop('_context', None)
+                root._kwargs.pop('context', None)
+            return len(views)
+
+        def release_serializers():
+            components = get_serializers()
+            for component in components:
+                component.object = _get_class_path(component.object)
+            return len(components)
+
+        def release_components():
+            keys = list(registry.keys())
+            for key in keys:
+                del registry[key]
+            # the built components of the schema share their objects with the registry
+            if isinstance(schema.get('components'), dict):
+                schema['components'] = {}
+            return len(keys)
+
+        def release_paths():
+            paths = schema.get('paths')
+            schema['paths'] = {}
+            return len(paths) if isinstance(paths, dict) else 0
+
+        self.release(f'view instances (serializer context){label}', release_views)
+        self.release(f'serializer instances (ResolvedComponent.object){label}', release_serializers)
+        self.release(f'registry (component schemas){label}', release_components)
+        self.release(f'paths{label}', release_paths)
+
+    def take_snapshot(self):
+        self.snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ])
+
+    def get_report(self, top=10) -> str:
+        lines = [f'peak traced memory {_format_size(self.peak).strip()}']
+        if self.phases:
+            lines += ['', f'{"retained":>11} {"peak":>11}  phase']
+            for name, (retained, peak) in self.phases.items():
+                lines.append(f'{_format_size(retained)} {_format_size(peak)}  {name}')
+        if self.groups:
+            lines += ['', f'{"retained":>11} {"objects":>8}  group (freed on release)']
+            for name, (count, size) in self.groups.items():
+                lines.append(f'{_format_size(size)} {count:>8}  {name}')
+        if self.snapshot:
+            lines += ['', f'{"retained":>11} {"blocks":>8}  allocation site']
+            for stat in self.snapshot.statistics('lineno')[:top]:
+                frame = stat.traceback[0]
+                lines.append(f'{_format_size(stat.size)} {stat.count:>8}  {frame.filename}:{frame.lineno}')
+        return '\n'.join(lines)
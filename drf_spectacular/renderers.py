@@ -1,14 +1,231 @@
+import enum
+import json
+import re
+from decimal import Decimal
+
 import yaml
-from rest_framework.renderers import OpenAPIRenderer
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONOpenAPIRenderer, OpenAPIRenderer
+
+from drf_spectacular.plumbing import LazyMapping
+from drf_spectacular.settings import spectacular_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# top-level keys whose nested mappings are emitted entry by entry when streaming.
+# the value is the number of nested mapping levels that get split up.
+STREAMING_DEPTH = {
+    'paths': 1,
+    'components': 2,
+}
+STREAMING_CHUNK_SIZE = 64 * 1024
+
+
+def _buffered(chunks, size=STREAMING_CHUNK_SIZE):
+    """ join tiny fragments into reasonably sized chunks """
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _iter_items(value):
+    """ items of a (possibly lazily produced) non-empty mapping or None if value is no such thing """
+    if not hasattr(value, 'items'):
+        return None
+    items = iter(value.items())
+    try:
+        first = next(items)
+    except StopIteration:
+        return None
+
+    def chain():
+        yield first
+        yield from items
+
+    return chain()
+
+
+def _get_leaf(value):
+    # lazy mappings only end up as leaves once their items turned out to be empty
+    return {} if isinstance(value, LazyMapping) else value
+
+
+# conversions for types that leak into schemas, e.g. via build_basic_type() or field
+# attributes like DecimalField.max_value. looked up by the MRO of the value's type.
+COERCIONS = {
+    Decimal: float,
+    Promise: force_str,
+    enum.Enum: lambda value: value.value,
+}
+_coercion_cache = {}
+
+
+def _get_coercion(cls):
+    try:
+        return _coercion_cache[cls]
+    except KeyError:
+        coercion = next((COERCIONS[base] for base in cls.__mro__ if base in COERCIONS), None)
+        _coercion_cache[cls] = coercion
+        return coercion
+
+
+def _coerce(value):
+    coercion = _get_coercion(type(value))
+    if coercion is None:
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+    return coercion(value)
+
+
+def _json_dumps(data) -> bytes:
+    return json.dumps(data, indent=2, default=_coerce).encode('utf-8')
+
+
+def _orjson_dumps(data) -> bytes:
+    try:
+        return orjson.dumps(data, default=_coerce, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        # e.g. integers beyond 64 bit, which json handles just fine
+        return _json_dumps(data)
+
+
+JSON_BACKENDS = {'json': _json_dumps}
+if orjson:
+    JSON_BACKENDS['orjson'] = _orjson_dumps
+
+
+def get_json_backend():
+    """ dumps function for ``JSON_BACKEND``. falls back to json if the library is unavailable """
+    return JSON_BACKENDS.get(spectacular_settings.JSON_BACKEND, _json_dumps)
+
+
+class NoAliasDumper(yaml.SafeDumper):
+    """ disable yaml advanced feature 'alias' for clean, portable, and readable output """
+
+    def ignore_aliases(self, data):
+        return True
+
+
+if getattr(yaml, '__with_libyaml__', False):
+    class CNoAliasDumper(yaml.CSafeDumper):
+        """ libyaml-backed version of :class:`NoAliasDumper` """
+
+        def ignore_aliases(self, data):
+            return True
+else:
+    CNoAliasDumper = None
+
+for _dumper in filter(None, [NoAliasDumper, CNoAliasDumper]):
+    _dumper.add_multi_representer(Decimal, lambda dumper, data: dumper.represent_float(float(data)))
+    _dumper.add_multi_representer(Promise, lambda dumper, data: dumper.represent_str(force_str(data)))
+    _dumper.add_multi_representer(enum.Enum, lambda dumper, data: dumper.represent_data(data.value))
+
+# libyaml folds quoted scalars differently than the pure-Python emitter. strings that
+# only consist of printable ASCII are emitted identically by both.
+_NON_PRINTABLE_ASCII = re.compile(r'[^\x20-\x7e]')
+
+
+def _is_printable_ascii(data) -> bool:
+    if isinstance(data, str):
+        return not _NON_PRINTABLE_ASCII.search(data)
+    elif isinstance(data, dict):
+        return all(_is_printable_ascii(k) and _is_printable_ascii(v) for k, v in data.items())
+    elif isinstance(data, (list, tuple)):
+        return all(_is_printable_ascii(v) for v in data)
+    elif isinstance(data, Promise):
+        return _is_printable_ascii(force_str(data))
+    elif isinstance(data, enum.Enum):
+        return _is_printable_ascii(data.value)
+    return True
 
 
 class NoAliasOpenAPIRenderer(OpenAPIRenderer):
     """ Remove this temp fix once DRF 3.11 is no longer supported """
 
     def render(self, data, media_type=None, renderer_context=None):
-        # disable yaml advanced feature 'alias' for clean, portable, and readable output
-        class Dumper(yaml.SafeDumper):
-            def ignore_aliases(self, data):
-                return True
+        # emitting fragment-wise allows using libyaml for all fragments it renders identically
+        return b''.join(self._iter_fragments(data))
+
+    def render_stream(self, data):
+        """
+        render incrementally, path by path and component by component. yields the same bytes
+        as :meth:`render`. the mappings in ``data`` may be produced lazily by their ``items()``.
+        """
+        return _buffered(self._iter_fragments(data))
+
+    def _iter_fragments(self, data):
+        items = _iter_items(data)
+        if items is None:
+            # empty mappings and anything but a mapping, e.g. None, are dumped as a whole
+            yield self._dump(_get_leaf(data)).encode('utf-8')
+            return
+        emitted_headers = ()
+        for keys, value in self._iter_leaves((), items, STREAMING_DEPTH.get):
+            fragment = value
+            for key in reversed(keys):
+                fragment = {key: fragment}
+            # every enclosing key is dumped as a header line of its own. skip the ones
+            # that were already emitted together with a previous fragment.
+            common = 0
+            while common < min(len(emitted_headers), len(keys) - 1) and emitted_headers[common] == keys[common]:
+                common += 1
+            yield self._dump(fragment).split('\n', common)[common].encode('utf-8')
+            emitted_headers = keys[:-1]
+
+    def _iter_leaves(self, keys, items, get_depth):
+        for key, value in items:
+            depth = get_depth(key)
+            sub_items = _iter_items(value) if depth else None
+            if sub_items is None:
+                yield keys + (key,), _get_leaf(value)
+            else:
+                yield from self._iter_leaves(keys + (key,), sub_items, lambda _: depth - 1)
+
+    def _dump(self, data):
+        # libyaml also omits the document end marker after top-level scalars
+        if CNoAliasDumper and isinstance(data, dict) and _is_printable_ascii(data):
+            dumper = CNoAliasDumper
+        else:
+            dumper = NoAliasDumper
+        return yaml.dump(data, default_flow_style=False, sort_keys=False, Dumper=dumper)
+
+
+class OpenApiJsonRenderer(JSONOpenAPIRenderer):
+    def render(self, data, media_type=None, renderer_context=None):
+        return get_json_backend()(data)
+
+    def render_stream(self, data):
+        """
+        render incrementally, path by path and component by component. yields the same bytes
+        as :meth:`render`. the mappings in ``data`` may be produced lazily by their ``items()``.
+        """
+        dumps = get_json_backend()
+        items = _iter_items(data)
+        if items is None:
+            return iter([dumps(_get_leaf(data))])
+        chunks = self._iter_object(items, STREAMING_DEPTH.get, 0, lambda v: dumps(v).decode('utf-8'))
+        return _buffered(chunk.encode('utf-8') for chunk in chunks)
 
-        return yaml.dump(data, default_flow_style=False, sort_keys=False, Dumper=Dumper).encode('utf-8')
+    def _iter_object(self, items, get_depth, level, dump):
+        indent = '\n' + '  ' * (level + 1)
+        empty = True
+        yield '{'
+        for key, value in items:
+            yield f'{"" if empty else ","}{indent}{dump(key)}: '
+            empty = False
+            depth = get_depth(key)
+            sub_items = _iter_items(value) if depth else None
+            if sub_items is None:
+                yield dump(_get_leaf(value)).replace('\n', indent)
+            else:
+                yield from self._iter_object(sub_items, lambda _: depth - 1, level + 1, dump)
+        yield '}' if empty else '\n' + '  ' * level + '}'
@@ -1,6 +1,7 @@
 from typing import Any, Dict
 
 from django.conf import settings
+from django.core.signals import setting_changed
 from rest_framework.settings import APISettings
 
 SPECTACULAR_DEFAULTS: Dict[str, Any] = {
@@ -12,6 +13,18 @@ SPECTACULAR_DEFAULTS: Dict[str, Any] = {
     #   method: DRF default sorting just by METHOD
     'OPERATION_SORTER': 'alpha',
     'DEFAULT_GENERATOR_CLASS': 'drf_spectacular.openapi.SchemaGenerator',
+    # inspect endpoints concurrently on this many threads. the schema is identical to
+    # serial inspection. None or 1 inspects one endpoint after another.
+    'GENERATOR_THREADS': None,
+    # keep inspected operations in this directory and reuse them in later runs, e.g. on CI,
+    # as long as the source files they were derived from are unchanged. serial inspection only.
+    # entries are pickles, so the directory must only be writable by trusted users.
+    'GENERATOR_CACHE_DIR': None,
+    # only generate the endpoints matching these patterns. dicts of 'path', 'method' and
+    # 'view_module' to lists of regular expressions, e.g. {'path': [r'/api/v2/billing/']}.
+    # applied before any view is created. components are pruned to what the subset references.
+    'ENDPOINT_INCLUDE': {},
+    'ENDPOINT_EXCLUDE': {},
 
     # Configuration for serving the schema with SpectacularAPIView
     'SERVE_URLCONF': None,
@@ -20,6 +33,46 @@ SPECTACULAR_DEFAULTS: Dict[str, Any] = {
     # is the
     'SERVE_INCLUDE_SCHEMA': True,
     'SERVE_PERMISSIONS': ['rest_framework.permissions.AllowAny'],
+    # render uncached schemas incrementally into a streaming response to keep memory flat
+    'SERVE_STREAMING': False,
+    # keep the generated schema in memory instead of regenerating it on every request.
+    # see drf_spectacular.cache.invalidate_schema_cache()
+    'SERVE_CACHE': False,
+    # with SERVE_PUBLIC=False, schemas are cached per distinct set of visible endpoints,
+    # authentication class and group membership. bounded by entries and age in seconds.
+    'SERVE_PRIVATE_CACHE_MAXSIZE': 32,
+    'SERVE_PRIVATE_CACHE_TTL': None,
+    # schemas of endpoint subsets and tags requested with query parameters are cached separately
+    # and bounded by this number of entries, least recently used first. endpoint subsets are not
+    # shared through SERVE_CACHE_STORAGE.
+    'SERVE_SUBSET_CACHE_MAXSIZE': 32,
+    # with SERVE_PUBLIC=False and SERVE_CACHE, derive the schema of every user from the cached
+    # full schema by only running the permission checks, instead of generating it per user.
+    # serializers are then not inspected with the user's request.
+    'SERVE_PRIVATE_FILTER': False,
+    # content encodings that cached schemas are precompressed with, in order of preference.
+    # 'br' requires the brotli package and is skipped if it is not installed.
+    'SERVE_CACHE_COMPRESSION': ['br', 'gzip'],
+    # generate the cached schema in a background thread on startup so that the first
+    # request is already served warm. optionally also render all formats. management
+    # commands other than runserver do not warm up.
+    'SERVE_CACHE_WARMUP': False,
+    'SERVE_CACHE_WARMUP_RENDER': False,
+    # optionally share cached schemas between processes and hosts. by default they only
+    # live in process memory. 'drf_spectacular.cache.DjangoCacheSchemaStorage' stores them
+    # in the Django cache SERVE_CACHE_ALIAS. bump SERVE_CACHE_VERSION on every deploy that
+    # changes the API, e.g. by setting it to the release version.
+    'SERVE_CACHE_STORAGE': None,
+    'SERVE_CACHE_ALIAS': 'default',
+    'SERVE_CACHE_VERSION': None,
+    # serve prebuilt schema files (./manage.py spectacular --file ...) instead of generating
+    # the schema at runtime. maps format ('openapi', 'openapi-json') to file path. formats
+    # without a file are derived from another file on first request.
+    'SERVE_ARTIFACTS': {},
+    # library used for rendering JSON: 'json' or the faster 'orjson', which must be installed.
+    # orjson emits non-ASCII characters unescaped. documents it cannot encode, e.g. with
+    # integers beyond 64 bit, are rendered with json instead.
+    'JSON_BACKEND': 'json',
 
     # Append OpenAPI objects to path and components in addition to the generated objects
     'APPEND_PATHS': {},
@@ -57,6 +110,7 @@ IMPORT_STRINGS = [
     'SCHEMA_AUTHENTICATION_CLASSES',
     'DEFAULT_GENERATOR_CLASS',
     'SERVE_PERMISSIONS',
+    'SERVE_CACHE_STORAGE',
 ]
 
 spectacular_settings = APISettings(
@@ -64,3 +118,13 @@ spectacular_settings = APISettings(
     defaults=SPECTACULAR_DEFAULTS,
     import_strings=IMPORT_STRINGS,
 )
+
+
+def reload_spectacular_settings(setting, value, **kwargs):
+    if setting == 'SPECTACULAR_SETTINGS':
+        spectacular_settings.reload()
+        # reload() would fall back to the REST_FRAMEWORK setting
+        spectacular_settings._user_settings = value or {}
+
+
+setting_changed.connect(reload_spectacular_settings)
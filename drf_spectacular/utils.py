@@ -87,6 +87,10 @@ def extend_schema(
 
     def decorator(f):
         class ExtendedSchema(api_settings.DEFAULT_SCHEMA_CLASS):
+            # known without a view. lets the generator skip view creation or inspection
+            _spectacular_exclude = exclude
+            _spectacular_operation = operation
+
             def get_operation(self, path, method, registry):
                 if exclude:
                     return None
@@ -1,9 +1,23 @@
-from rest_framework.renderers import JSONOpenAPIRenderer
+import hashlib
+import json
+import os
+
+import yaml
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from drf_spectacular.cache import (
+    PRIVATE_SCHEMA_CACHE, SCHEMA_CACHE, SUBSET_SCHEMA_CACHE, CachedSchema, choose_content_encoding,
+    get_schema_cache_key, get_schema_storage,
+)
+from drf_spectacular.plumbing import EndpointFilter, filter_schema_by_tags, get_schema_tags
 from drf_spectacular.settings import spectacular_settings
-from drf_spectacular.renderers import NoAliasOpenAPIRenderer
+from drf_spectacular.renderers import NoAliasOpenAPIRenderer, OpenApiJsonRenderer
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
 
@@ -20,19 +34,194 @@ class SpectacularAPIView(APIView):
     - YAML: application/vnd.oai.openapi
     - JSON: application/vnd.oai.openapi+json
     """
-    renderer_classes = [NoAliasOpenAPIRenderer, JSONOpenAPIRenderer]
+    renderer_classes = [NoAliasOpenAPIRenderer, OpenApiJsonRenderer]
     permission_classes = spectacular_settings.SERVE_PERMISSIONS
+    # subset of endpoints requested with ?path=, ?method=, ?view_module= and their
+    # ?exclude_ counterparts. paths and view modules are prefixes in which ``*`` matches
+    # any characters. regular expressions are reserved for settings. see EndpointFilter
+    endpoint_patterns = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        patterns = {'include': {}, 'exclude': {}}
+        for kind in EndpointFilter.KINDS:
+            for mode, param in [('include', kind), ('exclude', f'exclude_{kind}')]:
+                if request.query_params.getlist(param):
+                    patterns[mode][kind] = request.query_params.getlist(param)
+        if not patterns['include'] and not patterns['exclude']:
+            return
+        if spectacular_settings.SERVE_ARTIFACTS:
+            raise ParseError('endpoint filters are not available with SERVE_ARTIFACTS')
+        self._endpoint_fingerprint = EndpointFilter(**patterns, globs=True).get_fingerprint()
+        self.endpoint_patterns = patterns
 
     @extend_schema(**SCHEMA_KWARGS)
     def get(self, request):
+        # optionally serve a sub-schema with only the operations of the given tags
+        tags = request.query_params.getlist('tag')
+        artifacts = spectacular_settings.SERVE_ARTIFACTS
+        if artifacts and not tags and request.accepted_renderer.format in artifacts:
+            return self._get_file_response(request, artifacts[request.accepted_renderer.format])
+
+        if not artifacts and not spectacular_settings.SERVE_CACHE:
+            schema = self._get_schema(request)
+            if tags:
+                schema = filter_schema_by_tags(schema, tags)
+            if spectacular_settings.SERVE_STREAMING and hasattr(request.accepted_renderer, 'render_stream'):
+                return StreamingHttpResponse(
+                    request.accepted_renderer.render_stream(schema),
+                    content_type=request.accepted_media_type,
+                )
+            return Response(schema)
+
+        cache, cached_schema = self._get_cached_source(request)
+        if tags:
+            cached_schema = self._get_cached_tag_schema(cached_schema, tags)
+        response = self._get_cached_response(request, cached_schema)
+        if cache is PRIVATE_SCHEMA_CACHE:
+            patch_cache_control(response, private=True)
+        return response
+
+    def get_cached_schema(self) -> CachedSchema:
+        """ public schema from cache, generated on first access """
+        key = self.get_cache_key()
+        return self._get_public_cache().get_or_create(key, lambda: CachedSchema(
+            key=key, generate=self._get_schema, storage=self._get_schema_storage()
+        ))
+
+    def _get_public_cache(self):
+        # subsets requested by clients must not grow the unbounded cache
+        return SUBSET_SCHEMA_CACHE if self.endpoint_patterns else SCHEMA_CACHE
+
+    def _get_schema_storage(self):
+        """
+        shared schema storage, resolved at most once per request and only when a schema is
+        created, as it may query the Django cache. subsets requested by clients and schemas
+        derived from artifacts are not shared.
+        """
+        if not hasattr(self, '_schema_storage'):
+            if self.endpoint_patterns or spectacular_settings.SERVE_ARTIFACTS:
+                self._schema_storage = None
+            else:
+                self._schema_storage = get_schema_storage()
+        return self._schema_storage
+
+    def _get_cached_source(self, request):
+        """
+        :return: tuple of the cache the full schema lives in and the cached full schema
+        """
+        if spectacular_settings.SERVE_ARTIFACTS:
+            return SCHEMA_CACHE, self._get_cached_artifact_schema()
+        if spectacular_settings.SERVE_PUBLIC:
+            return self._get_public_cache(), self.get_cached_schema()
+
+        generator = self._get_generator()
+        if spectacular_settings.SERVE_PRIVATE_FILTER:
+            cached_schema = self._get_cached_filtered_schema(request, generator)
+            return PRIVATE_SCHEMA_CACHE, cached_schema
+        key = f'{self.get_cache_key()}:{generator.get_view_permissions_fingerprint(request)}'
+        cached_schema = PRIVATE_SCHEMA_CACHE.get_or_create(key, lambda: CachedSchema(
+            key=key,
+            generate=lambda: generator.get_schema(request=request, public=False),
+            storage=self._get_schema_storage(),
+        ))
+        return PRIVATE_SCHEMA_CACHE, cached_schema
+
+    def _get_cached_filtered_schema(self, request, generator):
+        """ sub-schema of the cached full schema with the operations the user has access to """
+        full_schema = self.get_cached_schema()
+        operations = generator.get_permitted_operations(request)
+        operations_hash = hashlib.sha256(
+            '\n'.join(f'{method} {path}' for path, method in sorted(operations)).encode()
+        ).hexdigest()[:16]
+        key = f'{full_schema.key}:operations:{operations_hash}'
+        return PRIVATE_SCHEMA_CACHE.get_or_create(key, lambda: CachedSchema(
+            key=key,
+            generate=lambda: generator.filter_schema(full_schema.schema, operations),
+            storage=self._get_schema_storage(),
+        ))
+
+    def _get_cached_tag_schema(self, cached_schema, tags):
+        """
+        sub-schema of ``cached_schema`` for the given tags, kept in the bounded subset cache.
+        tags that the schema does not use are ignored and thus never create entries.
+        """
+        tags = sorted(set(tags).intersection(get_schema_tags(cached_schema.schema)))
+        tags_hash = hashlib.sha256('\n'.join(tags).encode()).hexdigest()[:16]
+        key = f'{cached_schema.key}:tags:{tags_hash}'
+        return SUBSET_SCHEMA_CACHE.get_or_create(key, lambda: CachedSchema(
+            key=key,
+            generate=lambda: filter_schema_by_tags(cached_schema.schema, tags),
+            storage=self._get_schema_storage(),
+        ))
+
+    def get_cache_key(self):
+        key = get_schema_cache_key(
+            urlconf=spectacular_settings.SERVE_URLCONF,
+            generator_class=spectacular_settings.DEFAULT_GENERATOR_CLASS,
+        )
+        if self.endpoint_patterns:
+            key = f'{key}:endpoints:{self._endpoint_fingerprint}'
+        return key
+
+    def _get_cached_response(self, request, cached_schema):
+        encoding = choose_content_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        content, etag = cached_schema.render(request.accepted_renderer, encoding)
+        # pre-rendered Response. setting content marks it as rendered so the renderer is skipped
+        response = Response()
+        response.content = content
+        response['Content-Type'] = request.accepted_media_type
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(cached_schema.last_modified)
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        # answers If-None-Match/If-Modified-Since with 304 Not Modified
+        return get_conditional_response(
+            request, etag=etag, last_modified=cached_schema.last_modified, response=response
+        )
+
+    def _get_cached_artifact_schema(self):
+        """ formats without artifact are derived from another artifact on first request """
+        source_format, path = next(iter(spectacular_settings.SERVE_ARTIFACTS.items()))
+        key = f'artifact:{os.path.abspath(path)}:{os.stat(path).st_mtime_ns}'
+        return SCHEMA_CACHE.get_or_create(key, lambda: CachedSchema(
+            key=key, generate=lambda: self._load_artifact(path, source_format)
+        ))
+
+    def _get_file_response(self, request, path):
+        stat = os.stat(path)
+        etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+        last_modified = int(stat.st_mtime)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            # streamed, and zero-copy if the server provides wsgi.file_wrapper
+            response = FileResponse(open(path, 'rb'), content_type=request.accepted_media_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def _load_artifact(self, path, format):
+        with open(path, 'rb') as fh:
+            if format == 'openapi-json':
+                return json.load(fh)
+            return yaml.load(fh, Loader=yaml.SafeLoader)
+
+    def _get_generator(self):
         generator_class = spectacular_settings.DEFAULT_GENERATOR_CLASS
-        generator = generator_class(
+        if self.endpoint_patterns:
+            return generator_class(urlconf=spectacular_settings.SERVE_URLCONF, globs=True, **self.endpoint_patterns)
+        return generator_class(
             urlconf=spectacular_settings.SERVE_URLCONF,
         )
-        return Response(generator.get_schema(
+
+    def _get_schema(self, request=None):
+        return self._get_generator().get_schema(
             request=request,
             public=spectacular_settings.SERVE_PUBLIC
-        ))
+        )
 
 
 class SpectacularYAMLAPIView(SpectacularAPIView):
@@ -40,4 +229,31 @@ class SpectacularYAMLAPIView(SpectacularAPIView):
 
 
 class SpectacularJSONAPIView(SpectacularAPIView):
-    renderer_classes = [JSONOpenAPIRenderer]
+    renderer_classes = [OpenApiJsonRenderer]
+
+
+class SpectacularTagIndexView(SpectacularAPIView):
+    """
+    Tags of the OpenApi3 schema with their number of operations and the size in bytes
+    of their JSON sub-schema, which is served by SpectacularAPIView with ?tag=<name>
+    """
+    renderer_classes = [JSONRenderer]
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request):
+        renderer = OpenApiJsonRenderer()
+        if spectacular_settings.SERVE_ARTIFACTS or spectacular_settings.SERVE_CACHE:
+            cache, cached_schema = self._get_cached_source(request)
+            tags = get_schema_tags(cached_schema.schema)
+            sizes = cached_schema.get_tag_sizes(renderer)
+        else:
+            cache, schema = None, self._get_schema(request)
+            tags = get_schema_tags(schema)
+            sizes = {tag: len(renderer.render(filter_schema_by_tags(schema, [tag]))) for tag in tags}
+
+        response = Response({
+            'tags': [{'name': tag, 'operations': count, 'size': sizes[tag]} for tag, count in tags.items()]
+        })
+        if cache is PRIVATE_SCHEMA_CACHE:
+            patch_cache_control(response, private=True)
+        return response
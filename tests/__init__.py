@@ -20,14 +20,20 @@ def assert_schema(schema, reference_file):
     validate_schema(schema)
 
 
-def generate_schema(route, viewset):
+def get_generator(*registrations, **kwargs):
+    """ generator for a router with the given (route, viewset) registrations. kwargs are passed on """
     from rest_framework import routers
     from drf_spectacular.openapi import SchemaGenerator
 
     router = routers.SimpleRouter()
-    router.register(route, viewset, basename=route)
-    generator = SchemaGenerator(patterns=router.urls)
-    return generator.get_schema(request=None, public=True)
+    for route, viewset in registrations:
+        router.register(route, viewset, basename=route)
+    return SchemaGenerator(patterns=router.urls, **kwargs)
+
+
+def generate_schema(route, viewset, jobs=None, **kwargs):
+    generator = get_generator((route, viewset), **kwargs)
+    return generator.get_schema(request=None, public=True, jobs=jobs)
 
 
 skip_on_travis = pytest.mark.skipif(
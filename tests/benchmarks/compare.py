@@ -0,0 +1,28 @@
+"""
+compare two result files written with --spectacular-bench-json
+
+    python tests/benchmarks/compare.py baseline.json results.json
+"""
+import json
+import sys
+
+
+def load(path):
+    with open(path) as fh:
+        return {(r['task'], r['size']): r['seconds'] for r in json.load(fh)['results']}
+
+
+def compare(baseline_path, results_path):
+    baseline, results = load(baseline_path), load(results_path)
+    lines = [f'{"before [ms]":>12} {"after [ms]":>12} {"change":>8}  task']
+    for (task, size), seconds in results.items():
+        if (task, size) not in baseline:
+            continue
+        before = baseline[task, size]
+        change = (seconds - before) / before * 100 if before else 0.0
+        lines.append(f'{before * 1000:>12.1f} {seconds * 1000:>12.1f} {change:>+7.1f}%  {task} (size={size})')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    print(compare(*sys.argv[1:3]))
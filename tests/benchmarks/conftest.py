@@ -0,0 +1,57 @@
+import json
+import platform
+import time
+
+import django
+import pytest
+import rest_framework
+
+from drf_spectacular import __version__
+
+# results of the current session in order of measurement
+RESULTS = []
+
+
+def pytest_generate_tests(metafunc):
+    if 'benchmark_size' in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption('--spectacular-bench-sizes').split(',')]
+        metafunc.parametrize('benchmark_size', sizes)
+
+
+@pytest.fixture()
+def measure(request, benchmark_size):
+    """ run ``func`` for the configured number of rounds and record the best time """
+    rounds = request.config.getoption('--spectacular-bench-rounds')
+
+    def measure(task, func):
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        RESULTS.append({'task': task, 'size': benchmark_size, 'seconds': min(timings)})
+        return result
+
+    return measure
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not RESULTS:
+        return
+    terminalreporter.section('benchmarks (best of rounds)')
+    for result in RESULTS:
+        terminalreporter.write_line(f'{result["seconds"] * 1000:>10.1f}ms  size={result["size"]:<5} {result["task"]}')
+
+    path = config.getoption('--spectacular-bench-json')
+    if path:
+        with open(path, 'w') as fh:
+            json.dump({
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'django': django.__version__,
+                'djangorestframework': rest_framework.__version__,
+                'drf-spectacular': __version__,
+                'rounds': config.getoption('--spectacular-bench-rounds'),
+                'results': RESULTS,
+            }, fh, indent=2)
+        terminalreporter.write_line(f'results stored in {path}. compare runs with tests/benchmarks/compare.py')
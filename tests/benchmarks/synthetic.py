@@ -0,0 +1,85 @@
+"""
+factory for synthetic APIs of configurable size. every resource consists of a model, a
+serializer with a nested and a many-related field and a viewset with an extra action,
+pagination and filters. each resource relates to the previous one, so that components
+reference each other like in real APIs.
+"""
+import functools
+
+from django.db import models
+from rest_framework import filters, pagination, routers, serializers, viewsets
+from rest_framework.decorators import action
+from rest_framework.schemas.openapi import AutoSchema as DrfAutoSchema
+
+from drf_spectacular.openapi import AutoSchema
+
+
+class SyntheticPagination(pagination.PageNumberPagination):
+    page_size = 20
+
+
+@functools.lru_cache(maxsize=None)
+def build_models(size):
+    """ model classes are registered with the app registry and are thus created once per size """
+    result = []
+    for i in range(size):
+        attrs = {
+            '__module__': __name__,
+            'Meta': type('Meta', (), {'app_label': 'tests'}),
+            'title': models.CharField(max_length=255, help_text='title of the resource'),
+            'count': models.IntegerField(default=0),
+            'price': models.DecimalField(max_digits=10, decimal_places=2),
+            'is_active': models.BooleanField(default=True),
+            'created': models.DateTimeField(auto_now_add=True),
+            'state': models.CharField(max_length=10, choices=[('draft', 'Draft'), ('live', 'Live')]),
+        }
+        if result:
+            attrs['parent'] = models.ForeignKey(result[-1], on_delete=models.CASCADE, related_name='+')
+            attrs['related'] = models.ManyToManyField(result[-1], related_name='+')
+        result.append(type(f'Synthetic{size}Model{i}', (models.Model,), attrs))
+    return result
+
+
+def build_serializers(size):
+    result = []
+    for model in build_models(size):
+        attrs = {'Meta': type('Meta', (), {'model': model, 'fields': '__all__'})}
+        if result:
+            # nested. the many-related field is generated by the ModelSerializer
+            attrs['parent'] = result[-1](read_only=True)
+        result.append(type(model.__name__.replace('Model', 'Serializer'), (serializers.ModelSerializer,), attrs))
+    return result
+
+
+def build_viewsets(size, schema_class=AutoSchema):
+    result = []
+    for model, serializer in zip(build_models(size), build_serializers(size)):
+        def publish(self, request, pk=None):
+            pass  # pragma: no cover
+
+        result.append(type(model.__name__.replace('Model', 'Viewset'), (viewsets.ModelViewSet,), {
+            'queryset': model.objects.all(),
+            'serializer_class': serializer,
+            'pagination_class': SyntheticPagination,
+            'filter_backends': [filters.SearchFilter, filters.OrderingFilter],
+            'search_fields': ['title'],
+            'ordering_fields': ['title', 'created'],
+            'schema': schema_class(),
+            'publish': action(detail=True, methods=['post'])(publish),
+        }))
+    return result
+
+
+def build_urlpatterns(size, schema_class=AutoSchema):
+    """
+    urlpatterns of a synthetic API with ``size`` resources with 3 paths and 7 operations each.
+    pass DRF's ``AutoSchema`` as ``schema_class`` for DRF's own generator.
+    """
+    router = routers.SimpleRouter()
+    for i, viewset in enumerate(build_viewsets(size, schema_class)):
+        router.register(f'resource{i}', viewset, basename=f'resource{i}')
+    return router.urls
+
+
+def build_drf_urlpatterns(size):
+    return build_urlpatterns(size, DrfAutoSchema)
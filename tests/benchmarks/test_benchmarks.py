@@ -0,0 +1,39 @@
+"""
+opt-in benchmarks on synthetic APIs of several sizes. run with
+
+    pytest tests/benchmarks --spectacular-bench [--spectacular-bench-sizes 10,100]
+        [--spectacular-bench-json results.json]
+"""
+import pytest
+from rest_framework.schemas.openapi import SchemaGenerator as DrfSchemaGenerator
+
+from drf_spectacular.openapi import SchemaGenerator
+from drf_spectacular.plumbing import GENERATOR_STATS
+from drf_spectacular.renderers import NoAliasOpenAPIRenderer, OpenApiJsonRenderer
+from drf_spectacular.validation import validate_schema
+from tests.benchmarks.synthetic import build_drf_urlpatterns, build_urlpatterns
+
+pytestmark = pytest.mark.spectacular_bench
+
+
+def test_benchmark_generation(benchmark_size, measure):
+    urlpatterns = build_urlpatterns(benchmark_size)
+    schema = measure(
+        'drf-spectacular get_schema',
+        lambda: SchemaGenerator(patterns=urlpatterns).get_schema(request=None, public=True),
+    )
+    assert not GENERATOR_STATS.warn_counter
+    assert len(schema['paths']) == 3 * benchmark_size
+
+    measure('render yaml', lambda: NoAliasOpenAPIRenderer().render(schema))
+    measure('render json', lambda: OpenApiJsonRenderer().render(schema))
+    measure('validate_schema', lambda: validate_schema(schema))
+
+
+def test_benchmark_drf_baseline(benchmark_size, measure):
+    urlpatterns = build_drf_urlpatterns(benchmark_size)
+    schema = measure(
+        'drf get_schema (baseline)',
+        lambda: DrfSchemaGenerator(patterns=urlpatterns).get_schema(request=None, public=True),
+    )
+    assert len(schema['paths']) == 3 * benchmark_size
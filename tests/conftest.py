@@ -3,9 +3,31 @@ import pytest
 from django.core import management
 
 
-def pytest_configure():
+def pytest_addoption(parser):
+    group = parser.getgroup('spectacular-bench', 'benchmarks in tests/benchmarks')
+    group.addoption('--spectacular-bench', action='store_true', default=False, help='run the benchmarks')
+    group.addoption(
+        '--spectacular-bench-sizes', default='10,25,50',
+        help='comma separated numbers of resources of the synthetic APIs'
+    )
+    group.addoption('--spectacular-bench-rounds', type=int, default=3, help='best of this many rounds is reported')
+    group.addoption('--spectacular-bench-json', default=None, help='store the results in this file for comparison')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--spectacular-bench'):
+        return
+    skip = pytest.mark.skip(reason='benchmarks only run with --spectacular-bench')
+    for item in items:
+        if 'spectacular_bench' in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_configure(config):
     from django.conf import settings
 
+    config.addinivalue_line('markers', 'spectacular_bench: opt-in benchmark, see tests/benchmarks')
+
     settings.configure(
         DEBUG_PROPAGATE_EXCEPTIONS=True,
         DATABASES={'default': {
@@ -1,5 +1,15 @@
+import json
+from unittest import mock
+
+import pytest
 import yaml
 from django.core import management
+from django.core.management import CommandError
+
+from drf_spectacular.cache import SCHEMA_CACHE, DjangoCacheSchemaStorage, invalidate_schema_cache
+from drf_spectacular.openapi import SchemaGenerator
+from drf_spectacular.renderers import NoAliasOpenAPIRenderer, OpenApiJsonRenderer
+from drf_spectacular.views import SpectacularAPIView
 
 
 def test_command_plain(capsys):
@@ -10,3 +20,110 @@ def test_command_plain(capsys):
     assert 'openapi' in schema
     assert 'info' in schema
     assert 'paths' in schema
+
+
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE_STORAGE', DjangoCacheSchemaStorage)
+def test_command_populate_cache(capsys):
+    invalidate_schema_cache()
+    management.call_command('spectacular', populate_cache=True)
+    assert not capsys.readouterr().out
+
+    SCHEMA_CACHE.invalidate()
+    with mock.patch.object(SchemaGenerator, 'get_schema') as get_schema:
+        content, _ = SpectacularAPIView().get_cached_schema().render(NoAliasOpenAPIRenderer())
+    assert not get_schema.called
+    assert content.startswith(b'openapi: 3.0.3')
+    invalidate_schema_cache()
+
+
+def test_command_jobs(capsys):
+    management.call_command('spectacular', urlconf='tests.test_view', validate=True, fail_on_warn=True)
+    expected = capsys.readouterr().out
+    management.call_command('spectacular', urlconf='tests.test_view', validate=True, fail_on_warn=True, jobs=3)
+    assert capsys.readouterr().out == expected
+
+
+def test_command_populate_cache_requires_storage():
+    with pytest.raises(CommandError):
+        management.call_command('spectacular', populate_cache=True)
+
+
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE_STORAGE', DjangoCacheSchemaStorage)
+def test_command_populate_cache_requires_serve_cache():
+    with pytest.raises(CommandError, match='SERVE_CACHE=True'):
+        management.call_command('spectacular', populate_cache=True)
+
+
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE_STORAGE', DjangoCacheSchemaStorage)
+def test_command_populate_cache_fails_on_error():
+    invalidate_schema_cache()
+    with mock.patch.object(SchemaGenerator, 'get_schema', side_effect=ValueError('broken')):
+        with pytest.raises(CommandError, match='ValueError: broken'):
+            management.call_command('spectacular', populate_cache=True)
+    invalidate_schema_cache()
+
+
+def test_command_json_stream(capsys, tmp_path):
+    management.call_command('spectacular', format='openapi-json')
+    schema = json.loads(capsys.readouterr().out)
+    assert 'openapi' in schema
+
+    management.call_command('spectacular', format='openapi-json', file=str(tmp_path / 'schema.json'))
+    with open(tmp_path / 'schema.json', 'rb') as fh:
+        assert fh.read() == OpenApiJsonRenderer().render(schema)
+
+
+def test_command_cache_dir(capsys, tmp_path):
+    management.call_command('spectacular', urlconf='tests.test_view', fail_on_warn=True, cache_dir=str(tmp_path))
+    expected = capsys.readouterr()
+    assert 'operation cache: 0 hits, 4 misses' in expected.err
+
+    management.call_command('spectacular', urlconf='tests.test_view', fail_on_warn=True, cache_dir=str(tmp_path))
+    output = capsys.readouterr()
+    assert output.out == expected.out
+    assert 'operation cache: 4 hits, 0 misses' in output.err
+
+
+@pytest.mark.parametrize('format', ['openapi', 'openapi-json'])
+def test_command_stream(capsys, format):
+    management.call_command('spectacular', urlconf='tests.test_view', format=format, fail_on_warn=True)
+    expected = capsys.readouterr().out
+    management.call_command('spectacular', urlconf='tests.test_view', format=format, fail_on_warn=True, stream=True)
+    assert capsys.readouterr().out == expected
+
+
+def test_command_stream_cannot_validate():
+    with pytest.raises(CommandError):
+        management.call_command('spectacular', stream=True, validate=True)
+
+
+def test_command_endpoint_filter(capsys):
+    management.call_command(
+        'spectacular', urlconf='tests.test_view', fail_on_warn=True,
+        include_path=['/api/tagged', '/api/admin'], exclude_view_module=[r'tests\.test_views'],
+    )
+    schema = yaml.load(capsys.readouterr().out, Loader=yaml.SafeLoader)
+    assert list(schema['paths']) == ['/api/admin', '/api/tagged']
+    assert list(schema['components']['schemas']) == ['Tagged']
+
+    with pytest.raises(CommandError):
+        management.call_command('spectacular', include_method=['('])
+
+
+def test_command_multiple_urlconfs(capsys, tmp_path):
+    urlconfs = ['tests.test_view', 'tests.test_fields']
+    expected = {}
+    for urlconf in urlconfs:
+        management.call_command('spectacular', urlconf=urlconf)
+        expected[urlconf] = capsys.readouterr().out
+
+    management.call_command('spectacular', urlconf=urlconfs, file=str(tmp_path / 'schema-{urlconf}.yml'))
+    assert 'component memo: ' in capsys.readouterr().err
+    for urlconf in urlconfs:
+        with open(tmp_path / f'schema-{urlconf}.yml') as fh:
+            assert fh.read() == expected[urlconf]
+
+    with pytest.raises(CommandError):
+        management.call_command('spectacular', urlconf=urlconfs, file=str(tmp_path / 'schema.yml'))
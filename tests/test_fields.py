@@ -10,6 +10,8 @@ from rest_framework import serializers, viewsets
 from rest_framework.routers import SimpleRouter
 from rest_framework.test import APIClient
 
+from drf_spectacular.openapi import AutoSchema
+from drf_spectacular.types import OpenApiTypes
 from tests import assert_schema, generate_schema
 
 
@@ -189,3 +191,69 @@ def test_model_setup_is_valid():
 
     response = APIClient().get(reverse('allfields-detail', args=(m.pk,)))
     assert response.status_code == 200
+
+
+class MoneyField(serializers.DecimalField):
+    pass
+
+
+class CentsField(MoneyField):
+    pass
+
+
+class UnknownField(serializers.Field):
+    pass
+
+
+class CustomFieldsSerializer(serializers.Serializer):
+    money = MoneyField(max_digits=10, decimal_places=2)
+    cents = CentsField(max_digits=10, decimal_places=0)
+    duration = serializers.DurationField()
+    unknown = UnknownField()
+
+
+class CustomFieldsAutoSchema(AutoSchema):
+    def _map_money_field(self, method, field):
+        return {'type': 'string', 'format': 'money'}
+
+
+CustomFieldsAutoSchema.register_field_mapping(MoneyField, '_map_money_field')
+CustomFieldsAutoSchema.register_field_mapping(serializers.DurationField, OpenApiTypes.STR)
+
+
+@CustomFieldsAutoSchema.register_field_mapping(UnknownField)
+def map_unknown_field(auto_schema, method, field):
+    return None
+
+
+class CustomFieldsViewset(viewsets.GenericViewSet):
+    serializer_class = CustomFieldsSerializer
+    schema = CustomFieldsAutoSchema()
+
+    def create(self, request):
+        pass  # pragma: no cover
+
+
+def test_field_mapping_registration(capsys):
+    properties = generate_schema('x', CustomFieldsViewset)['components']['schemas']['CustomFields']['properties']
+    # subclasses of registered classes are mapped alike
+    assert properties['money'] == properties['cents'] == {'type': 'string', 'format': 'money'}
+    assert properties['duration'] == {'type': 'string'}
+    assert properties['unknown'] == {'type': 'string'}
+    assert 'could not resolve serializer field UnknownField()' in capsys.readouterr().err
+    # only registered with the AutoSchema subclass
+    assert MoneyField not in AutoSchema.field_mappings
+    assert AutoSchema().field_mappings is not CustomFieldsAutoSchema.field_mappings
+
+    class CentsAutoSchema(CustomFieldsAutoSchema):
+        pass
+
+    CentsAutoSchema.register_field_mapping(CentsField, OpenApiTypes.INT)
+    CustomFieldsViewset.schema = CentsAutoSchema()
+    try:
+        properties = generate_schema('x', CustomFieldsViewset)['components']['schemas']['CustomFields']['properties']
+        assert properties['cents'] == {'type': 'integer'}
+        assert properties['money'] == {'type': 'string', 'format': 'money'}
+        assert CentsField not in CustomFieldsAutoSchema.field_mappings
+    finally:
+        CustomFieldsViewset.schema = CustomFieldsAutoSchema()
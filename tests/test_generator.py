@@ -0,0 +1,515 @@
+import time
+from unittest import mock
+
+import pytest
+import yaml
+from django.conf.urls import url
+from rest_framework import filters, mixins, pagination, serializers, viewsets
+from rest_framework.views import APIView
+
+from drf_spectacular.openapi import AutoSchema
+from drf_spectacular.plumbing import ComponentMemo
+from drf_spectacular.renderers import NoAliasOpenAPIRenderer, OpenApiJsonRenderer
+from drf_spectacular.utils import extend_schema
+from tests import generate_schema, get_generator
+from tests.test_basic import AlbumModelViewset, AlbumSerializer, SongSerializer
+from tests.test_extend_schema import DoesItAllViewset
+from tests.test_fields import AllFieldsModelViewset
+from tests.test_polymorphic import PersonViewSet
+from tests.test_recursion import TreeNodeViewset
+
+
+@pytest.mark.parametrize('route,viewset,reference_file', [
+    ('albums', AlbumModelViewset, 'tests/test_basic.yml'),
+    ('doesitall', DoesItAllViewset, 'tests/test_extend_schema.yml'),
+    ('allfields', AllFieldsModelViewset, 'tests/test_fields.yml'),
+    ('persons', PersonViewSet, 'tests/test_polymorphic.yml'),
+    ('nodes', TreeNodeViewset, 'tests/test_recursion.yml'),
+])
+@mock.patch('drf_spectacular.settings.spectacular_settings.GENERATOR_THREADS', 4)
+def test_concurrent_inspection_is_identical(no_warnings, route, viewset, reference_file):
+    schema = generate_schema(route, viewset)
+    with open(reference_file) as fh:
+        assert NoAliasOpenAPIRenderer().render(schema).decode() == fh.read()
+
+
+@mock.patch('drf_spectacular.settings.spectacular_settings.GENERATOR_THREADS', 8)
+def test_concurrent_inspection_registers_in_endpoint_order(no_warnings):
+    with mock.patch('drf_spectacular.settings.spectacular_settings.GENERATOR_THREADS', None):
+        expected = generate_schema('albums', AlbumModelViewset)
+
+    get_operation = AutoSchema.get_operation
+
+    def delayed_get_operation(self, path, method, registry):
+        # let PATCH overtake the previous endpoints. the nested components would
+        # otherwise be resolved in its context, i.e. without required fields.
+        if method != 'PATCH':
+            time.sleep(0.05)
+        return get_operation(self, path, method, registry)
+
+    with mock.patch.object(AutoSchema, 'get_operation', delayed_get_operation):
+        schema = generate_schema('albums', AlbumModelViewset)
+    assert schema == expected
+
+
+@pytest.mark.parametrize('jobs', [2, 3, 100])
+@pytest.mark.parametrize('route,viewset,reference_file', [
+    ('albums', AlbumModelViewset, 'tests/test_basic.yml'),
+    ('doesitall', DoesItAllViewset, 'tests/test_extend_schema.yml'),
+    ('allfields', AllFieldsModelViewset, 'tests/test_fields.yml'),
+    ('persons', PersonViewSet, 'tests/test_polymorphic.yml'),
+    ('nodes', TreeNodeViewset, 'tests/test_recursion.yml'),
+])
+def test_sharded_inspection_is_identical(no_warnings, route, viewset, reference_file, jobs):
+    schema = generate_schema(route, viewset, jobs=jobs)
+    with open(reference_file) as fh:
+        assert NoAliasOpenAPIRenderer().render(schema).decode() == fh.read()
+
+
+class OrderDependentViewset(viewsets.ModelViewSet):
+    serializer_class = AlbumSerializer
+    queryset = AlbumModelViewset.queryset
+
+    # resolved in the context of PATCH unless the first shard registered it before
+    @extend_schema(request=AlbumSerializer(read_only=True))
+    def partial_update(self, request, *args, **kwargs):
+        pass  # pragma: no cover
+
+
+def test_sharded_inspection_repeats_order_dependent_inspection(capsys):
+    expected = generate_schema('albums', OrderDependentViewset)
+    assert expected['paths']['/albums/{id}/']['patch']['requestBody']['required']
+
+    schema = generate_schema('albums', OrderDependentViewset, jobs=4)
+    assert schema == expected
+    assert 'repeating inspection serially' in capsys.readouterr().err
+
+
+class InnerSerializer(serializers.Serializer):
+    value = serializers.IntegerField()
+
+
+class OuterSerializer(serializers.Serializer):
+    inner = InnerSerializer()
+
+
+class WrapperSerializer(serializers.Serializer):
+    # keeps its name with PATCH. its nested Inner does not
+    outer = OuterSerializer(read_only=True)
+
+
+class InnerWrapperSerializer(WrapperSerializer):
+    inner = InnerSerializer()
+
+
+class OuterAPIView(APIView):
+    @extend_schema(responses=OuterSerializer)
+    def get(self, request):
+        pass  # pragma: no cover
+
+
+class WrapperAPIView(APIView):
+    @extend_schema(request=WrapperSerializer(read_only=True), responses=WrapperSerializer)
+    def patch(self, request):
+        pass  # pragma: no cover
+
+
+class InnerWrapperAPIView(APIView):
+    @extend_schema(request=InnerWrapperSerializer(read_only=True), responses=InnerWrapperSerializer)
+    def patch(self, request):
+        pass  # pragma: no cover
+
+
+class UrlconfIndirect:
+    urlpatterns = [url(r'^a/$', OuterAPIView.as_view()), url(r'^b/$', WrapperAPIView.as_view())]
+
+
+class UrlconfIndirectReached:
+    urlpatterns = [url(r'^a/$', OuterAPIView.as_view()), url(r'^b/$', InnerWrapperAPIView.as_view())]
+
+
+@pytest.mark.parametrize('urlconf,serially', [(UrlconfIndirect, False), (UrlconfIndirectReached, True)])
+def test_sharded_inspection_drops_indirectly_diverging_components(capsys, urlconf, serially):
+    from drf_spectacular.openapi import SchemaGenerator
+
+    expected = SchemaGenerator(urlconf=urlconf).get_schema(request=None, public=True)
+    assert ('PatchedInner' in expected['components']['schemas']) == serially
+
+    schema = SchemaGenerator(urlconf=urlconf).get_schema(request=None, public=True, jobs=2)
+    assert schema == expected
+    assert list(schema['components']['schemas']) == list(expected['components']['schemas'])
+    assert ('repeating inspection serially' in capsys.readouterr().err) == serially
+
+
+@pytest.fixture
+def inspected():
+    """ paths and methods of the operations inspected during the test """
+    inspected = []
+    get_operation = AutoSchema.get_operation
+
+    def recording_get_operation(self, path, method, registry):
+        inspected.append((path, method))
+        return get_operation(self, path, method, registry)
+
+    with mock.patch.object(AutoSchema, 'get_operation', recording_get_operation):
+        yield inspected
+
+
+@pytest.mark.parametrize('route,viewset,reference_file', [
+    ('albums', AlbumModelViewset, 'tests/test_basic.yml'),
+    ('doesitall', DoesItAllViewset, 'tests/test_extend_schema.yml'),
+    ('allfields', AllFieldsModelViewset, 'tests/test_fields.yml'),
+    ('persons', PersonViewSet, 'tests/test_polymorphic.yml'),
+    ('nodes', TreeNodeViewset, 'tests/test_recursion.yml'),
+])
+def test_operation_cache_is_identical(no_warnings, tmp_path, route, viewset, reference_file):
+    from drf_spectacular.plumbing import GENERATOR_STATS
+
+    with open(reference_file) as fh:
+        reference = fh.read()
+    schema = generate_schema(route, viewset, cache_dir=str(tmp_path))
+    assert GENERATOR_STATS.operation_cache_hits == 0
+    assert NoAliasOpenAPIRenderer().render(schema).decode() == reference
+
+    schema = generate_schema(route, viewset, cache_dir=str(tmp_path))
+    assert GENERATOR_STATS.operation_cache_misses == 0
+    assert NoAliasOpenAPIRenderer().render(schema).decode() == reference
+
+
+def test_operation_cache_inspects_changed_sources(no_warnings, tmp_path, inspected):
+    from drf_spectacular.cache import OperationCache
+
+    expected = generate_schema('albums', AlbumModelViewset, cache_dir=str(tmp_path))
+    assert len(inspected) == 7
+    inspected.clear()
+
+    assert generate_schema('albums', AlbumModelViewset, cache_dir=str(tmp_path)) == expected
+    assert not inspected
+
+    # the module defining the viewset and its serializers was edited
+    edited = AlbumModelViewset.__module__.replace('.', '/') + '.py'
+    get_digest = OperationCache.get_digest
+    with mock.patch.object(
+        OperationCache, 'get_digest', lambda self, path: 'x' if path.endswith(edited) else get_digest(self, path)
+    ):
+        assert generate_schema('albums', AlbumModelViewset, cache_dir=str(tmp_path)) == expected
+        assert len(inspected) == 7
+
+
+class PaginatedAlbumViewset(AlbumModelViewset):
+    pagination_class = pagination.PageNumberPagination
+    filter_backends = [filters.OrderingFilter]
+
+
+@pytest.mark.parametrize('edited,expected_inspected', [
+    ('rest_framework/pagination.py', [('/albums/', 'GET')]),
+    ('rest_framework/filters.py', [
+        ('/albums/', 'GET'), ('/albums/{id}/', 'GET'), ('/albums/{id}/', 'PUT'),
+        ('/albums/{id}/', 'PATCH'), ('/albums/{id}/', 'DELETE'),
+    ]),
+    ('rest_framework/parsers.py', [
+        ('/albums/', 'POST'), ('/albums/{id}/', 'PUT'), ('/albums/{id}/', 'PATCH'),
+    ]),
+])
+def test_operation_cache_tracks_view_collaborators(no_warnings, tmp_path, inspected, edited, expected_inspected):
+    from drf_spectacular.cache import OperationCache
+
+    expected = generate_schema('albums', PaginatedAlbumViewset, cache_dir=str(tmp_path))
+    inspected.clear()
+
+    get_digest = OperationCache.get_digest
+    with mock.patch.object(
+        OperationCache, 'get_digest', lambda self, path: 'x' if path.endswith(edited) else get_digest(self, path)
+    ):
+        assert generate_schema('albums', PaginatedAlbumViewset, cache_dir=str(tmp_path)) == expected
+        assert sorted(inspected) == sorted(expected_inspected)
+
+
+def test_operation_cache_skips_entries_with_diverging_components(no_warnings, tmp_path, inspected):
+    expected = generate_schema('albums', OrderDependentViewset)
+    # PATCH alone registers the serializer in its own context
+    generate_schema('albums', OrderDependentViewset, cache_dir=str(tmp_path), include={'method': ['PATCH']})
+    inspected.clear()
+
+    assert generate_schema('albums', OrderDependentViewset, cache_dir=str(tmp_path)) == expected
+    assert ('/albums/{id}/', 'PATCH') in inspected
+
+
+class UnresolvableViewset(mixins.ListModelMixin, viewsets.GenericViewSet):
+    pass
+
+
+def test_operation_cache_repeats_warnings(tmp_path, capsys):
+    from drf_spectacular.plumbing import GENERATOR_STATS
+
+    generate_schema('x', UnresolvableViewset, cache_dir=str(tmp_path))
+    stderr = capsys.readouterr().err
+    assert GENERATOR_STATS.warn_counter
+    warn_counter = GENERATOR_STATS.warn_counter
+
+    generate_schema('x', UnresolvableViewset, cache_dir=str(tmp_path))
+    assert GENERATOR_STATS.operation_cache_hits == 1
+    assert GENERATOR_STATS.warn_counter == warn_counter
+    assert capsys.readouterr().err == stderr
+
+
+def test_endpoint_enumeration_is_shared_per_urlconf(no_warnings):
+    from rest_framework.schemas.generators import EndpointEnumerator
+
+    from drf_spectacular.cache import invalidate_schema_cache
+    from drf_spectacular.openapi import SchemaGenerator, _get_mtime
+
+    invalidate_schema_cache()
+    get_api_endpoints = EndpointEnumerator.get_api_endpoints
+    with mock.patch.object(
+        EndpointEnumerator, 'get_api_endpoints', autospec=True, side_effect=get_api_endpoints
+    ) as enumerate_endpoints:
+        expected = SchemaGenerator(urlconf='tests.test_view').get_schema(request=None, public=True)
+        assert enumerate_endpoints.call_count == 1
+        assert SchemaGenerator(urlconf='tests.test_view').get_schema(request=None, public=True) == expected
+        assert enumerate_endpoints.call_count == 1
+
+        # the urlconf module was edited
+        with mock.patch(
+            'drf_spectacular.openapi._get_mtime',
+            lambda path: 0 if path.endswith('tests/test_view.py') else _get_mtime(path)
+        ):
+            assert SchemaGenerator(urlconf='tests.test_view').get_schema(request=None, public=True) == expected
+        assert enumerate_endpoints.call_count == 2
+
+        invalidate_schema_cache()
+        SchemaGenerator(urlconf='tests.test_view').get_schema(request=None, public=True)
+        assert enumerate_endpoints.call_count == 3
+
+
+class StaticViewset(viewsets.GenericViewSet):
+    queryset = AlbumModelViewset.queryset
+
+    @extend_schema(exclude=True)
+    def list(self, request):
+        pass  # pragma: no cover
+
+    @extend_schema(operation={'operationId': 'static', 'responses': {'200': {'description': 'static'}}})
+    def create(self, request):
+        pass  # pragma: no cover
+
+    @extend_schema(responses=AlbumSerializer)
+    def retrieve(self, request, pk=None):
+        pass  # pragma: no cover
+
+
+def test_extend_schema_overrides_skip_view_creation_and_inspection(no_warnings):
+    from drf_spectacular.openapi import SchemaGenerator
+
+    create_view = SchemaGenerator.create_view
+    get_operations = SchemaGenerator._get_operations
+    with mock.patch.object(
+        SchemaGenerator, 'create_view', autospec=True, side_effect=create_view
+    ) as spy_create_view, mock.patch.object(
+        SchemaGenerator, '_get_operations', autospec=True, side_effect=get_operations
+    ) as spy_get_operations:
+        schema = generate_schema('x', StaticViewset)
+
+    assert sorted(c[0][2] for c in spy_create_view.call_args_list) == ['GET', 'POST']
+    assert [(path, method) for path, method, _ in spy_get_operations.call_args[0][1]] == [('/x/{id}/', 'GET')]
+    assert list(schema['paths']) == ['/x/', '/x/{id}/']
+    assert schema['paths']['/x/'] == {
+        'post': {'operationId': 'static', 'responses': {'200': {'description': 'static'}}}
+    }
+    assert schema['paths']['/x/{id}/']['get']['operationId'] == 'x_retrieve'
+
+
+@pytest.mark.parametrize('sorter', ['alpha', 'method'])
+@pytest.mark.parametrize('renderer_class', [NoAliasOpenAPIRenderer, OpenApiJsonRenderer])
+@pytest.mark.parametrize('route,viewset', [
+    ('albums', AlbumModelViewset),
+    ('doesitall', DoesItAllViewset),
+    ('persons', PersonViewSet),
+    ('nodes', TreeNodeViewset),
+    ('x', StaticViewset),
+])
+def test_streamed_schema_is_identical(no_warnings, route, viewset, renderer_class, sorter):
+    with mock.patch('drf_spectacular.settings.spectacular_settings.OPERATION_SORTER', sorter):
+        expected = renderer_class().render(get_generator((route, viewset)).get_schema(request=None, public=True))
+        schema = get_generator((route, viewset)).get_schema_stream(request=None, public=True)
+        assert b''.join(renderer_class().render_stream(schema)) == expected
+
+
+@mock.patch('drf_spectacular.settings.spectacular_settings.APPEND_PATHS', {
+    '/albums/': {'get': {'operationId': 'appended'}},
+    '/appended/': {'get': {'operationId': 'appended'}},
+})
+def test_streamed_schema_append_paths(no_warnings):
+    expected = get_generator(('albums', AlbumModelViewset)).get_schema(request=None, public=True)
+    schema = get_generator(('albums', AlbumModelViewset)).get_schema_stream(request=None, public=True)
+    assert yaml.safe_load(b''.join(NoAliasOpenAPIRenderer().render_stream(schema))) == expected
+    assert list(expected['paths'])[0] == '/albums/'
+    assert list(expected['paths'])[-1] == '/appended/'
+
+
+def test_iter_operations_inspects_lazily(no_warnings, inspected):
+    operations = get_generator(('albums', AlbumModelViewset)).iter_operations()
+    assert next(operations)[:2] == ('/albums/', 'get')
+    assert len(inspected) == 1
+    assert len(list(operations)) == 6
+    assert len(inspected) == 7
+
+
+def get_filtered_generator(**kwargs):
+    return get_generator(('albums', AlbumModelViewset), ('persons', PersonViewSet), **kwargs)
+
+
+def test_endpoint_filter_skips_view_creation(no_warnings):
+    from drf_spectacular.openapi import SchemaGenerator
+
+    create_view = SchemaGenerator.create_view
+    with mock.patch.object(SchemaGenerator, 'create_view', autospec=True, side_effect=create_view) as spy:
+        schema = get_filtered_generator(include={'path': ['/persons/']}).get_schema(request=None, public=True)
+    assert {c[0][1].cls for c in spy.call_args_list} == {PersonViewSet}
+    assert schema == generate_schema('persons', PersonViewSet)
+
+
+def test_endpoint_filter_kinds(no_warnings):
+    generator = get_filtered_generator(
+        include={'method': ['get', 'DELETE']},
+        exclude={'view_module': [r'tests\.test_polymorphic'], 'path': [r'/albums/\{pk\}/like/']},
+    )
+    schema = generator.get_schema(request=None, public=True)
+    assert {path: list(path_item) for path, path_item in schema['paths'].items()} == {
+        '/albums/': ['get'],
+        '/albums/{id}/': ['get', 'delete'],
+    }
+    assert not any(name.startswith('Person') for name in schema['components']['schemas'])
+
+
+@mock.patch('drf_spectacular.settings.spectacular_settings.ENDPOINT_EXCLUDE', {'path': ['/albums/']})
+def test_endpoint_filter_settings(no_warnings):
+    schema = get_filtered_generator().get_schema(request=None, public=True)
+    assert all(path.startswith('/persons/') for path in schema['paths'])
+    # settings and arguments apply both
+    schema = get_filtered_generator(include={'method': ['POST']}).get_schema(request=None, public=True)
+    assert list(schema['paths']) == ['/persons/']
+
+
+def test_endpoint_filter_globs(no_warnings):
+    from drf_spectacular.plumbing import EndpointFilter
+
+    endpoint_filter = EndpointFilter(
+        include={'path': ['/albums/*/like'], 'method': ['post']}, exclude={'view_module': ['tests.*poly']}, globs=True
+    )
+    assert endpoint_filter.matches('/albums/{pk}/like/', 'POST', AlbumModelViewset)
+    assert not endpoint_filter.matches('/albums/{pk}/like/', 'GET', AlbumModelViewset)
+    assert not endpoint_filter.matches('/albums/', 'POST', AlbumModelViewset)
+    assert not endpoint_filter.matches('/albums/{pk}/like/', 'POST', PersonViewSet)
+
+    # no catastrophic backtracking
+    endpoint_filter = EndpointFilter(include={'path': ['/' + '*a' * 50 + 'b']}, globs=True)
+    start = time.perf_counter()
+    assert not endpoint_filter.matches('/' + 'a' * 2000, 'GET', AlbumModelViewset)
+    assert time.perf_counter() - start < 1
+
+
+def test_endpoint_filter_unknown_kind():
+    from drf_spectacular.plumbing import EndpointFilter
+
+    with pytest.raises(ValueError):
+        EndpointFilter(include={'tag': ['albums']})
+
+
+@mock.patch('drf_spectacular.settings.spectacular_settings.APPEND_COMPONENTS', {
+    'schemas': {'Unused': {'type': 'object'}},
+})
+def test_endpoint_filter_prunes_components(no_warnings):
+    schema = get_filtered_generator().get_schema(request=None, public=True)
+    assert 'Unused' in schema['components']['schemas']
+
+    generator = get_filtered_generator(include={'path': ['/albums/']})
+    expected = generator.get_schema(request=None, public=True)
+    assert 'Unused' not in expected['components']['schemas']
+    assert 'securitySchemes' in expected['components']
+
+    generator = get_filtered_generator(include={'path': ['/albums/']})
+    schema = generator.get_schema_stream(request=None, public=True)
+    assert yaml.safe_load(b''.join(NoAliasOpenAPIRenderer().render_stream(schema))) == expected
+
+
+class UnhintedSerializer(serializers.Serializer):
+    unhinted = serializers.SerializerMethodField()
+
+    def get_unhinted(self, obj):
+        pass  # pragma: no cover
+
+
+class PatchAlbumAPIView(APIView):
+    # resolves Album and its nested components in the context of PATCH
+    @extend_schema(request=AlbumSerializer(read_only=True), responses=UnhintedSerializer)
+    def patch(self, request):
+        pass  # pragma: no cover
+
+
+class SongAPIView(APIView):
+    @extend_schema(responses=SongSerializer)
+    def get(self, request):
+        pass  # pragma: no cover
+
+
+class UrlconfV1:
+    # Song is registered before Album and thus only referenced by it
+    urlpatterns = [url(r'^a-songs/$', SongAPIView.as_view())] + get_filtered_generator().patterns + [
+        url(r'^unhinted/$', PatchAlbumAPIView.as_view())
+    ]
+
+
+class UrlconfV2:
+    urlpatterns = [url(r'^a/$', PatchAlbumAPIView.as_view())] + get_generator(('albums', AlbumModelViewset)).patterns
+
+
+class UrlconfV3:
+    urlpatterns = get_generator(('albums', AlbumModelViewset)).patterns
+
+
+def test_batch_generation_is_identical(capsys):
+    from drf_spectacular.openapi import SchemaGenerator
+
+    expected = {}
+    for urlconf in [UrlconfV1, UrlconfV2, UrlconfV3]:
+        expected[urlconf] = SchemaGenerator(urlconf=urlconf).get_schema(request=None, public=True)
+    expected_warnings = capsys.readouterr().err
+    # resolved in the context of PATCH first
+    assert 'required' not in expected[UrlconfV2]['components']['schemas']['Album']
+    assert 'required' in expected[UrlconfV1]['components']['schemas']['Album']
+
+    store = ComponentMemo.store
+    with mock.patch.object(ComponentMemo, 'store', autospec=True, side_effect=store) as m:
+        schemas = SchemaGenerator.get_schemas([UrlconfV1, UrlconfV2, UrlconfV3], public=True)
+    assert schemas == expected
+    assert list(schemas) == [UrlconfV1, UrlconfV2, UrlconfV3]
+    # warnings of memoized serializers are repeated
+    assert capsys.readouterr().err == expected_warnings
+    memo = m.call_args[0][0]
+    assert memo.hits and memo.misses
+
+
+def test_component_memo_is_bypassed_while_recording(no_warnings, tmp_path):
+    memo = ComponentMemo()
+    generator = get_generator(('albums', AlbumModelViewset))
+    generator.component_memo = generator.registry.memo = memo
+    generator.cache_dir = str(tmp_path)
+    generator.get_schema(request=None, public=True)
+    assert not memo.hits and not memo.misses
+
+
+class UrlconfWrapper:
+    urlpatterns = [url(r'^b/$', WrapperAPIView.as_view())]
+
+
+def test_batch_generation_remaps_components_with_diverging_dependents(no_warnings):
+    from drf_spectacular.openapi import SchemaGenerator
+
+    # Outer is registered by GET first and thus does not lead to PatchedInner
+    expected = SchemaGenerator(urlconf=UrlconfIndirect).get_schema(request=None, public=True)
+    assert 'PatchedInner' not in expected['components']['schemas']
+
+    schemas = SchemaGenerator.get_schemas([UrlconfWrapper, UrlconfIndirect], public=True)
+    assert 'PatchedInner' in schemas[UrlconfWrapper]['components']['schemas']
+    assert schemas[UrlconfIndirect] == expected
@@ -1,7 +1,9 @@
 from django.db import models
 from rest_framework import serializers
 
-from drf_spectacular.plumbing import is_serializer, force_instance, is_field
+from drf_spectacular.plumbing import (
+    filter_schema_by_tags, force_instance, get_schema_tags, is_field, is_serializer,
+)
 
 
 def test_is_serializer():
@@ -30,3 +32,42 @@ def test_force_instance():
     assert isinstance(force_instance(serializers.CharField), serializers.CharField)
     assert force_instance(5) == 5
     assert force_instance(dict) == dict
+
+
+def test_filter_schema_by_tags():
+    schema = {
+        'openapi': '3.0.3',
+        'paths': {
+            '/a/': {
+                'get': {'tags': ['a'], 'responses': {'200': {'$ref': '#/components/responses/A'}}},
+                'post': {'tags': ['b'], 'security': [{'basicAuth': []}], 'responses': {}},
+                'parameters': [],
+            },
+            '/b/': {'get': {'tags': ['b'], 'responses': {}}},
+        },
+        'components': {
+            'responses': {'A': {'content': {'application/json': {'$ref': '#/components/schemas/X'}}}},
+            'schemas': {
+                'X': {'properties': {'y': {'$ref': '#/components/schemas/Y'}}},
+                'Y': {'properties': {'x': {'$ref': '#/components/schemas/X'}}},
+                'Z': {},
+            },
+            'securitySchemes': {'basicAuth': {'type': 'http'}, 'tokenAuth': {'type': 'apiKey'}},
+        },
+        'tags': [{'name': 'a'}, {'name': 'b'}],
+    }
+    assert get_schema_tags(schema) == {'a': 1, 'b': 2}
+    assert filter_schema_by_tags(schema, ['a']) == {
+        'openapi': '3.0.3',
+        'paths': {'/a/': {'get': schema['paths']['/a/']['get'], 'parameters': []}},
+        'components': {
+            'responses': schema['components']['responses'],
+            'schemas': {'X': schema['components']['schemas']['X'], 'Y': schema['components']['schemas']['Y']},
+        },
+        'tags': [{'name': 'a'}],
+    }
+    sub_schema = filter_schema_by_tags(schema, ['b', 'c'])
+    assert list(sub_schema['paths']) == ['/a/', '/b/']
+    assert list(sub_schema['paths']['/a/']) == ['post', 'parameters']
+    assert sub_schema['components'] == {'securitySchemes': {'basicAuth': {'type': 'http'}}}
+    assert filter_schema_by_tags(schema, ['c'])['paths'] == {}
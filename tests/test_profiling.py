@@ -0,0 +1,129 @@
+import json
+
+from django.core import management
+
+import tracemalloc
+
+from drf_spectacular.profiling import (
+    GenerationProfiler, MemoryProfiler, get_active_profiler, profile_phase,
+)
+from tests import generate_schema, get_generator
+from tests.test_basic import AlbumModelViewset
+from tests.test_polymorphic import PersonViewSet
+
+
+def test_profiler_records_endpoints_phases_and_serializers(no_warnings):
+    expected = generate_schema('albums', AlbumModelViewset)
+    with GenerationProfiler() as profiler:
+        assert generate_schema('albums', AlbumModelViewset) == expected
+    assert get_active_profiler() is None
+
+    endpoints = profiler.get_entries(kind='endpoint')
+    assert len(endpoints) == 7
+    assert {'GET /albums/ (AlbumModelViewset)', 'POST /albums/{id}/like/ (AlbumModelViewset)'} <= {
+        entry['name'] for entry in endpoints
+    }
+    assert endpoints == sorted(endpoints, key=lambda entry: entry['wall'], reverse=True)
+    phases = {entry['name']: entry['calls'] for entry in profiler.get_entries(kind='phase')}
+    assert phases == {'parameters': 7, 'request body': 7, 'auth': 7, 'responses': 7}
+    serializers = {entry['name'] for entry in profiler.get_entries(kind='serializer')}
+    assert {'Album', 'Song', 'PatchedAlbum'} <= serializers
+    extensions = {entry['name'] for entry in profiler.get_entries(kind='extension')}
+    assert any(name.startswith('drf_spectacular.authentication.') for name in extensions)
+
+
+def test_profiler_records_serializer_extensions(no_warnings):
+    with GenerationProfiler() as profiler:
+        generate_schema('persons', PersonViewSet)
+    extensions = {entry['name'] for entry in profiler.get_entries(kind='extension')}
+    assert 'drf_spectacular.serializers.PolymorphicProxySerializerExtension' in extensions
+
+
+def test_profiler_merges_worker_timings(no_warnings):
+    with GenerationProfiler() as profiler:
+        generate_schema('albums', AlbumModelViewset, jobs=3)
+    assert len(profiler.get_entries(kind='endpoint')) == 7
+    assert sum(entry['calls'] for entry in profiler.get_entries(kind='phase', top=1)) == 7
+
+
+def test_profiler_report():
+    profiler = GenerationProfiler()
+    with profiler:
+        for name in ['a', 'b', 'c']:
+            with profile_phase('endpoint', name):
+                pass
+        with profile_phase('extension', profiler):
+            pass
+    report = profiler.get_report(top=2)
+    assert report.startswith('profiled ')
+    assert 'drf_spectacular.profiling.GenerationProfiler' in report
+    assert len([line for line in report.splitlines() if line.endswith(('  a', '  b', '  c'))]) == 2
+    assert json.loads(json.dumps(profiler.as_dict(top=1)))['entries'][0]['calls'] == 1
+
+
+def test_command_profile(capsys, tmp_path):
+    management.call_command('spectacular', urlconf='tests.test_view', profile_json=str(tmp_path / 'profile.json'))
+    assert 'profiled ' in capsys.readouterr().err
+    with open(tmp_path / 'profile.json') as fh:
+        profile = json.load(fh)
+    kinds = {entry['kind'] for entry in profile['entries']}
+    assert {'generator', 'endpoint', 'phase', 'serializer', 'extension'} <= kinds
+
+
+def test_memory_profiler_phases_and_groups():
+    with MemoryProfiler() as memory:
+        with memory.phase('allocate'):
+            retained = [bytearray(100000) for _ in range(10)]
+        with memory.phase('transient'):
+            transient = [bytearray(100000) for _ in range(10)]
+            del transient
+        memory.take_snapshot()
+
+        def release():
+            count = len(retained)
+            retained.clear()
+            return count
+
+        memory.release('retained', release)
+    assert not tracemalloc.is_tracing()
+    assert memory.phases['allocate'][0] >= 1000000
+    assert memory.phases['transient'][0] < 100000
+    assert memory.phases['transient'][1] >= 1000000
+    assert memory.peak >= 1000000
+    assert memory.groups['retained'][0] == 10
+    assert memory.groups['retained'][1] >= 1000000
+    report = memory.get_report(top=3)
+    assert report.startswith('peak traced memory ')
+    assert __file__ in report
+    assert len([line for line in report.splitlines() if ' allocation site' in line]) == 1
+
+
+class ContextAlbumViewset(AlbumModelViewset):
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, **kwargs)
+
+
+def test_memory_profiler_generator_groups(no_warnings):
+    # overridden get_serializer() is used for inspection, which puts the view in the serializer context
+    generator = get_generator(('albums', ContextAlbumViewset))
+    with MemoryProfiler() as memory:
+        schema = generator.get_schema(request=None, public=True)
+        component_count, path_count = len(generator.registry.keys()), len(schema['paths'])
+        memory.release_generator(generator, schema)
+    groups = {name.split(' ')[0]: (count, size) for name, (count, size) in memory.groups.items()}
+    assert groups['view'][0] >= 1
+    assert groups['registry'] == (component_count, groups['registry'][1])
+    assert groups['paths'][0] == path_count
+    # released memory is attributed to one group only, so it adds up to at most what was traced
+    assert all(size >= 0 for count, size in groups.values())
+    assert sum(size for count, size in groups.values()) <= memory.peak
+    assert not generator.registry.keys() and not schema['paths']
+
+
+def test_command_memory_report(capsys):
+    management.call_command('spectacular', urlconf='tests.test_view', memory_report=True, stream=True)
+    report = capsys.readouterr().err
+    assert 'peak traced memory ' in report
+    assert report.count('  rendering') == 1
+    assert 'serializer instances (ResolvedComponent.object)' in report
+    assert ' allocation site' in report
@@ -0,0 +1,123 @@
+import enum
+import glob
+import json
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+import yaml
+from django.utils.translation import gettext_lazy as _
+
+from drf_spectacular.renderers import (
+    JSON_BACKENDS, CNoAliasDumper, NoAliasDumper, NoAliasOpenAPIRenderer, OpenApiJsonRenderer,
+)
+
+REFERENCE_SCHEMAS = [f for f in glob.glob('tests/**/*.yml', recursive=True) if not f.endswith('_out.yml')]
+
+
+@pytest.mark.parametrize('json_backend', JSON_BACKENDS)
+@pytest.mark.parametrize('renderer_class', [NoAliasOpenAPIRenderer, OpenApiJsonRenderer])
+@pytest.mark.parametrize('reference_file', REFERENCE_SCHEMAS)
+def test_render_stream_is_identical(reference_file, renderer_class, json_backend):
+    with open(reference_file) as fh:
+        schema = yaml.load(fh, Loader=yaml.SafeLoader)
+
+    renderer = renderer_class()
+    with mock.patch('drf_spectacular.settings.spectacular_settings.JSON_BACKEND', json_backend):
+        assert b''.join(renderer.render_stream(schema)) == renderer.render(schema)
+
+
+@pytest.mark.parametrize('json_backend', JSON_BACKENDS)
+@pytest.mark.parametrize('reference_file', REFERENCE_SCHEMAS)
+def test_json_backends_are_equivalent(reference_file, json_backend):
+    with open(reference_file) as fh:
+        schema = yaml.load(fh, Loader=yaml.SafeLoader)
+
+    with mock.patch('drf_spectacular.settings.spectacular_settings.JSON_BACKEND', json_backend):
+        rendered = OpenApiJsonRenderer().render(schema)
+    # orjson only differs in not escaping non-ASCII characters
+    assert rendered.decode('utf-8') == json.dumps(schema, indent=2, ensure_ascii=json_backend == 'json')
+
+
+@pytest.mark.parametrize('data', [None, {}, [], 'schema'])
+@pytest.mark.parametrize('renderer_class', [NoAliasOpenAPIRenderer, OpenApiJsonRenderer])
+def test_render_non_mapping_data(renderer_class, data):
+    renderer = renderer_class()
+    if renderer_class is NoAliasOpenAPIRenderer:
+        expected = yaml.dump(data, default_flow_style=False, sort_keys=False, Dumper=NoAliasDumper)
+    else:
+        expected = json.dumps(data, indent=2)
+    assert renderer.render(data) == expected.encode('utf-8')
+    assert b''.join(renderer.render_stream(data)) == expected.encode('utf-8')
+
+
+def test_json_backend_defaults_to_json():
+    # orjson is opt-in even if installed, as its output differs
+    assert OpenApiJsonRenderer().render({'description': 'café'}) == b'{\n  "description": "caf\\u00e9"\n}'
+
+
+class Color(enum.Enum):
+    RED = 'red'
+
+
+@pytest.mark.parametrize('json_backend', JSON_BACKENDS)
+@pytest.mark.parametrize('renderer_class', [NoAliasOpenAPIRenderer, OpenApiJsonRenderer])
+def test_render_leaked_types(renderer_class, json_backend):
+    schema = {
+        'paths': {'/a/': {'get': {'description': _('lazy'), 'x-color': Color.RED}}},
+        'components': {'schemas': {'A': {'type': 'number', 'maximum': Decimal('10.5')}}},
+    }
+    expected = {
+        'paths': {'/a/': {'get': {'description': 'lazy', 'x-color': 'red'}}},
+        'components': {'schemas': {'A': {'type': 'number', 'maximum': 10.5}}},
+    }
+    renderer = renderer_class()
+    with mock.patch('drf_spectacular.settings.spectacular_settings.JSON_BACKEND', json_backend):
+        assert renderer.render(schema) == renderer.render(expected)
+        assert b''.join(renderer.render_stream(schema)) == renderer.render(expected)
+
+
+@pytest.mark.parametrize('json_backend', JSON_BACKENDS)
+def test_json_render_unsupported_values(json_backend):
+    renderer = OpenApiJsonRenderer()
+    with mock.patch('drf_spectacular.settings.spectacular_settings.JSON_BACKEND', json_backend):
+        # beyond the 64 bit range of orjson
+        assert json.loads(renderer.render({'maximum': 10 ** 30})) == {'maximum': 10 ** 30}
+        with pytest.raises(TypeError):
+            renderer.render({'default': object()})
+
+
+@pytest.mark.parametrize('reference_file', REFERENCE_SCHEMAS)
+def test_yaml_render_identical_to_pure_python_dump(reference_file):
+    with open(reference_file) as fh:
+        schema = yaml.load(fh, Loader=yaml.SafeLoader)
+
+    expected = yaml.dump(schema, default_flow_style=False, sort_keys=False, Dumper=NoAliasDumper)
+    assert NoAliasOpenAPIRenderer().render(schema) == expected.encode('utf-8')
+
+
+@pytest.mark.skipif(not CNoAliasDumper, reason='libyaml not available')
+def test_yaml_render_uses_libyaml():
+    schema = {'paths': {'/a/': {'get': {'description': 'plain'}}, '/b/': {'get': {'description': 'ünïcode'}}}}
+    with mock.patch.object(yaml, 'dump', wraps=yaml.dump) as dump:
+        NoAliasOpenAPIRenderer().render(schema)
+    assert [c[1]['Dumper'] for c in dump.call_args_list] == [CNoAliasDumper, NoAliasDumper]
+
+
+@pytest.mark.parametrize('renderer_class', [NoAliasOpenAPIRenderer, OpenApiJsonRenderer])
+def test_render_stream_lazy_and_empty(renderer_class):
+    class LazyMapping:
+        def __init__(self, data):
+            self.data = data
+
+        def items(self):
+            yield from self.data.items()
+
+    paths = {'/a/': {'get': {'operationId': 'a'}}, '/b/': {'get': {'operationId': 'b'}}}
+    schema = {'openapi': '3.0.3', 'paths': paths, 'components': {'schemas': {}, 'securitySchemes': {'x': {}}}}
+    lazy_schema = {**schema, 'paths': LazyMapping(paths), 'components': LazyMapping(schema['components'])}
+
+    renderer = renderer_class()
+    assert b''.join(renderer.render_stream(lazy_schema)) == renderer.render(schema)
+    assert b''.join(renderer.render_stream({'paths': {}})) == renderer.render({'paths': {}})
+    assert b''.join(renderer.render_stream({})) == renderer.render({})
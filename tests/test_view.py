@@ -1,12 +1,61 @@
+import functools
+import gc
+import gzip
+import json
+import threading
+import weakref
+from unittest import mock
+
 import pytest
 import yaml
 from django.conf.urls import url
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import management
+from django.test import override_settings
+from rest_framework import serializers
+from rest_framework.permissions import IsAdminUser
 from rest_framework.test import APIClient
+from rest_framework.views import APIView
 
+from drf_spectacular.cache import (
+    PRIVATE_SCHEMA_CACHE, SCHEMA_CACHE, SUBSET_SCHEMA_CACHE, CachedSchema, DjangoCacheSchemaStorage, SchemaCache,
+    choose_content_encoding, get_schema_cache_key, get_schema_storage, invalidate_schema_cache, start_schema_warmup,
+)
+from drf_spectacular.plumbing import GENERATOR_STATS
+from drf_spectacular.openapi import SchemaGenerator
+from drf_spectacular.renderers import NoAliasOpenAPIRenderer
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
 from drf_spectacular.validation import validate_schema
-from drf_spectacular.views import SpectacularAPIView
+from drf_spectacular.views import SpectacularAPIView, SpectacularTagIndexView
+
+
+class AdminOnlyAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        pass  # pragma: no cover
+
+
+class TaggedSerializer(serializers.Serializer):
+    field = serializers.IntegerField()
+
 
-urlpatterns = [url(r'^api/schema$', SpectacularAPIView.as_view(), name='schema')]
+class TaggedAPIView(APIView):
+    @extend_schema(responses=TaggedSerializer, tags=['tagged'])
+    def get(self, request):
+        pass  # pragma: no cover
+
+
+urlpatterns = [
+    url(r'^api/schema$', SpectacularAPIView.as_view(), name='schema'),
+    url(r'^api/schema/tags$', SpectacularTagIndexView.as_view(), name='schema-tags'),
+    url(r'^api/admin$', AdminOnlyAPIView.as_view(), name='admin'),
+    url(r'^api/tagged$', TaggedAPIView.as_view(), name='tagged'),
+]
 
 
 @pytest.mark.urls(__name__)
@@ -17,3 +66,475 @@ def test_spectacular_view(no_warnings):
     assert response.accepted_media_type == 'application/vnd.oai.openapi'
     schema = yaml.load(response.content, Loader=yaml.SafeLoader)
     validate_schema(schema)
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+def test_spectacular_view_cache(no_warnings):
+    invalidate_schema_cache()
+    with mock.patch.object(SchemaGenerator, 'get_schema', autospec=True, side_effect=SchemaGenerator.get_schema) as m:
+        response_1 = APIClient().get('/api/schema')
+        response_2 = APIClient().get('/api/schema')
+        assert m.call_count == 1
+        assert response_1.content == response_2.content
+
+        invalidate_schema_cache()
+        APIClient().get('/api/schema')
+        assert m.call_count == 2
+
+        with override_settings(SPECTACULAR_SETTINGS={}):
+            APIClient().get('/api/schema')
+        assert m.call_count == 3
+    invalidate_schema_cache()
+
+
+def test_schema_cache_key_depends_on_settings():
+    key = get_schema_cache_key(urlconf=None, generator_class=SchemaGenerator)
+    assert key == get_schema_cache_key(urlconf=None, generator_class=SchemaGenerator)
+    assert key != get_schema_cache_key(urlconf='tests.urls_other', generator_class=SchemaGenerator)
+    with mock.patch('drf_spectacular.settings.spectacular_settings.TITLE', 'Other'):
+        assert key != get_schema_cache_key(urlconf=None, generator_class=SchemaGenerator)
+    with override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.TokenAuthentication'],
+    }):
+        assert key != get_schema_cache_key(urlconf=None, generator_class=SchemaGenerator)
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+def test_spectacular_view_conditional_get(no_warnings):
+    invalidate_schema_cache()
+    response = APIClient().get('/api/schema')
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/vnd.oai.openapi'
+    assert response['Vary'] == 'Accept, Accept-Encoding'
+    assert 'Content-Encoding' not in response
+    etag, last_modified = response['ETag'], response['Last-Modified']
+
+    json_response = APIClient().get('/api/schema', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+    assert json_response['Content-Type'] == 'application/vnd.oai.openapi+json'
+    assert json_response['ETag'] != etag
+
+    with mock.patch.object(NoAliasOpenAPIRenderer, 'render') as render:
+        response = APIClient().get('/api/schema', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        assert not response.content
+        response = APIClient().head('/api/schema', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        response = APIClient().get('/api/schema', HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+        response = APIClient().get('/api/schema', HTTP_IF_NONE_MATCH='"outdated"')
+        assert response.status_code == 200
+        assert not render.called
+    invalidate_schema_cache()
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+def test_spectacular_view_precompressed(no_warnings):
+    invalidate_schema_cache()
+    identity_response = APIClient().get('/api/schema')
+    response = APIClient().get('/api/schema', HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert response.status_code == 200
+    assert response['Content-Encoding'] == 'gzip'
+    assert response['ETag'] != identity_response['ETag']
+    assert gzip.decompress(response.content) == identity_response.content
+
+    response = APIClient().get('/api/schema', HTTP_ACCEPT_ENCODING='gzip;q=0')
+    assert 'Content-Encoding' not in response
+    assert response.content == identity_response.content
+    invalidate_schema_cache()
+
+
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE_COMPRESSION', ['br', 'gzip'])
+def test_choose_content_encoding():
+    brotli = pytest.importorskip('brotli')  # noqa: F841
+    assert choose_content_encoding('') is None
+    assert choose_content_encoding('identity') is None
+    assert choose_content_encoding('gzip, deflate, br') == 'br'
+    assert choose_content_encoding('gzip;q=1.0, br;q=0.5') == 'gzip'
+    assert choose_content_encoding('*') == 'br'
+    assert choose_content_encoding('*, br;q=0') == 'gzip'
+
+
+@pytest.mark.django_db
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_PUBLIC', False)
+def test_spectacular_view_private_cache(no_warnings):
+    invalidate_schema_cache()
+    users = [User.objects.create(username=f'user{i}') for i in range(3)]
+    admin = User.objects.create(username='admin', is_staff=True)
+
+    def get_schema(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/schema')
+        assert response.status_code == 200
+        assert 'private' in response['Cache-Control']
+        return yaml.load(response.content, Loader=yaml.SafeLoader)
+
+    with mock.patch.object(SchemaGenerator, 'get_schema', autospec=True, side_effect=SchemaGenerator.get_schema) as m:
+        for user in users:
+            assert '/api/admin' not in get_schema(user)['paths']
+        assert m.call_count == 1
+        assert '/api/admin' in get_schema(admin)['paths']
+        assert m.call_count == 2
+    invalidate_schema_cache()
+
+
+@pytest.mark.django_db
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_PUBLIC', False)
+def test_spectacular_view_private_filter(no_warnings):
+    invalidate_schema_cache()
+    users = [User.objects.create(username=f'filtered{i}') for i in range(2)]
+    admin = User.objects.create(username='filtered-admin', is_staff=True)
+
+    def get_schema(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/schema')
+        assert response.status_code == 200
+        assert 'private' in response['Cache-Control']
+        return yaml.load(response.content, Loader=yaml.SafeLoader)
+
+    expected = {user: get_schema(user) for user in [users[0], admin]}
+    invalidate_schema_cache()
+
+    get_schema_spy = mock.patch.object(
+        SchemaGenerator, 'get_schema', autospec=True, side_effect=SchemaGenerator.get_schema
+    )
+    with mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_PRIVATE_FILTER', True), get_schema_spy as m:
+        assert get_schema(admin) == expected[admin]
+        for user in users:
+            assert get_schema(user) == expected[users[0]]
+        # only the full schema is generated
+        assert m.call_count == 1
+        assert m.call_args[1]['public'] is False and m.call_args[1]['request'] is None
+    invalidate_schema_cache()
+
+
+def test_operation_index_shared_between_generators():
+    invalidate_schema_cache()
+    index = SchemaGenerator(urlconf=__name__).get_operation_index()
+    assert ('/api/schema', 'get') in index
+    assert SchemaGenerator(urlconf=__name__).get_operation_index() is index
+    subset = SchemaGenerator(urlconf=__name__, include={'path': ['/api/admin*']}, globs=True)
+    assert subset.get_operation_index() is not index
+    assert ('/api/schema', 'get') not in subset.get_operation_index()
+
+    invalidate_schema_cache()
+    assert SchemaGenerator(urlconf=__name__).get_operation_index() is not index
+    invalidate_schema_cache()
+
+
+def test_schema_cache_bounds():
+    cache = SchemaCache(maxsize=2, ttl=60)
+    cache.get_or_create('a', lambda: 1)
+    cache.get_or_create('b', lambda: 2)
+    cache.get_or_create('a', lambda: 3)  # hit, marks 'a' as recently used
+    cache.get_or_create('c', lambda: 4)
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert len(cache) == 2
+
+    with mock.patch('drf_spectacular.cache.time.monotonic', return_value=10 ** 9):
+        assert cache.get_or_create('a', lambda: 5) == 5
+
+
+def test_schema_cache_generates_keys_independently():
+    cache = SchemaCache()
+    cache.get_or_create('warm', lambda: 0)
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def slow_factory():
+        calls.append(None)
+        started.set()
+        release.wait(5)
+        return 1
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_create('slow', slow_factory))) for _ in range(2)
+    ]
+    threads[0].start()
+    assert started.wait(5)
+    threads[1].start()
+    # neither warm hits nor other keys wait for the running generation
+    others = []
+    other = threading.Thread(target=lambda: others.extend([
+        cache.get_or_create('warm', lambda: -1), cache.get_or_create('other', lambda: 2)
+    ]))
+    other.start()
+    other.join(2)
+    assert others == [0, 2]
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [1, 1] and len(calls) == 1
+
+
+def test_schema_cache_drops_generations_started_before_invalidation():
+    cache = SchemaCache()
+
+    def factory():
+        cache.invalidate()
+        return 1
+
+    assert cache.get_or_create('a', factory) == 1
+    assert 'a' not in cache
+    with pytest.raises(ValueError):
+        cache.get_or_create('a', mock.Mock(side_effect=ValueError))
+    assert cache.get_or_create('a', lambda: 2) == 2
+
+
+def test_cached_schema_releases_generator():
+    generator = SchemaGenerator(urlconf=__name__)
+    generator_ref = weakref.ref(generator)
+    cached_schema = CachedSchema('key', generate=functools.partial(generator.get_schema, request=None, public=True))
+    del generator
+    gc.collect()
+    assert generator_ref() is None
+    assert cached_schema.schema['paths']
+
+
+def test_private_schema_cache_follows_settings():
+    assert PRIVATE_SCHEMA_CACHE.maxsize == 32 and PRIVATE_SCHEMA_CACHE.ttl is None
+    with override_settings(SPECTACULAR_SETTINGS={'SERVE_PRIVATE_CACHE_MAXSIZE': 1, 'SERVE_PRIVATE_CACHE_TTL': 5}):
+        assert PRIVATE_SCHEMA_CACHE.maxsize == 1 and PRIVATE_SCHEMA_CACHE.ttl == 5
+    assert PRIVATE_SCHEMA_CACHE.maxsize == 32 and PRIVATE_SCHEMA_CACHE.ttl is None
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+def test_schema_cache_warmup(capsys):
+    invalidate_schema_cache()
+    start_schema_warmup(render=True).join()
+    assert 'schema cache warm-up finished' in capsys.readouterr().err
+    assert GENERATOR_STATS.warmup_duration is not None
+
+    with mock.patch.object(SchemaGenerator, 'get_schema') as get_schema:
+        with mock.patch.object(NoAliasOpenAPIRenderer, 'render') as render:
+            response = APIClient().get('/api/schema')
+    assert response.status_code == 200
+    assert not get_schema.called and not render.called
+    invalidate_schema_cache()
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+def test_schema_cache_warmup_failure(capsys):
+    invalidate_schema_cache()
+    with mock.patch.object(SchemaGenerator, 'get_schema', side_effect=ValueError('broken')):
+        start_schema_warmup().join()
+    assert 'schema cache warm-up failed with ValueError: broken' in capsys.readouterr().err
+    invalidate_schema_cache()
+
+
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE_WARMUP', True)
+def test_schema_cache_warmup_on_ready():
+    with mock.patch('drf_spectacular.cache.start_schema_warmup') as start:
+        apps.get_app_config('drf_spectacular').ready()
+    start.assert_called_once_with(render=False)
+
+
+@pytest.mark.parametrize('argv,environ,started', [
+    (['manage.py', 'spectacular', '--file', 'schema.yml'], {}, False),
+    (['/usr/bin/django-admin', 'migrate'], {}, False),
+    (['/lib/django/__main__.py', 'shell'], {}, False),
+    (['manage.py', 'runserver'], {}, False),
+    (['manage.py', 'runserver'], {'RUN_MAIN': 'true'}, True),
+    (['manage.py', 'runserver', '--noreload'], {}, True),
+    (['/usr/bin/gunicorn', 'app.wsgi'], {}, True),
+])
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE_WARMUP', True)
+def test_schema_cache_warmup_skips_management_commands(argv, environ, started):
+    with mock.patch('drf_spectacular.cache.start_schema_warmup') as start:
+        with mock.patch('sys.argv', argv), mock.patch.dict('os.environ', environ):
+            apps.get_app_config('drf_spectacular').ready()
+    assert start.called == started
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE_STORAGE', DjangoCacheSchemaStorage)
+def test_spectacular_view_shared_storage(no_warnings):
+    invalidate_schema_cache()
+    response_1 = APIClient().get('/api/schema')
+    # simulate another process with an empty in-memory cache
+    SCHEMA_CACHE.invalidate()
+    with mock.patch.object(SchemaGenerator, 'get_schema') as get_schema:
+        with mock.patch.object(NoAliasOpenAPIRenderer, 'render') as render, mock.patch(
+            'drf_spectacular.views.get_schema_storage', side_effect=get_schema_storage
+        ) as storage:
+            response_2 = APIClient().get('/api/schema')
+    assert not get_schema.called and not render.called
+    # resolved once per request
+    assert storage.call_count == 1
+    assert response_1.content == response_2.content
+    assert response_1['ETag'] == response_2['ETag']
+    assert response_1['Last-Modified'] == response_2['Last-Modified']
+    # in-memory hits do not query the storage
+    with mock.patch('drf_spectacular.views.get_schema_storage') as storage:
+        response_3 = APIClient().get('/api/schema')
+    assert not storage.called
+    assert response_3.content == response_1.content
+
+    # explicit invalidation also reaches the shared storage
+    invalidate_schema_cache()
+    with mock.patch.object(SchemaGenerator, 'get_schema', autospec=True, side_effect=SchemaGenerator.get_schema) as m:
+        APIClient().get('/api/schema')
+    assert m.call_count == 1
+    invalidate_schema_cache()
+
+
+@pytest.mark.urls(__name__)
+def test_spectacular_view_artifacts(no_warnings, tmp_path):
+    invalidate_schema_cache()
+    artifact = str(tmp_path / 'schema.yml')
+    management.call_command('spectacular', file=artifact)
+
+    with mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_ARTIFACTS', {'openapi': artifact}):
+        with mock.patch.object(SchemaGenerator, 'get_schema') as get_schema:
+            response = APIClient().get('/api/schema')
+            assert response.status_code == 200
+            assert response['Content-Type'] == 'application/vnd.oai.openapi'
+            with open(artifact, 'rb') as fh:
+                assert b''.join(response.streaming_content) == fh.read()
+
+            response = APIClient().get('/api/schema', HTTP_IF_NONE_MATCH=response['ETag'])
+            assert response.status_code == 304
+
+            response = APIClient().get('/api/schema', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+            assert response.status_code == 200
+            assert response['Content-Type'] == 'application/vnd.oai.openapi+json'
+            with open(artifact, 'rb') as fh:
+                assert json.loads(response.content) == yaml.load(fh, Loader=yaml.SafeLoader)
+        assert not get_schema.called
+    invalidate_schema_cache()
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_STREAMING', True)
+def test_spectacular_view_streaming(no_warnings):
+    response = APIClient().get('/api/schema', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'application/vnd.oai.openapi+json'
+    validate_schema(json.loads(b''.join(response.streaming_content)))
+
+
+@pytest.mark.parametrize('serve_cache', [False, True])
+@pytest.mark.urls(__name__)
+def test_spectacular_view_tags(no_warnings, serve_cache):
+    invalidate_schema_cache()
+    with mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', serve_cache):
+        response = APIClient().get('/api/schema?tag=tagged', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        assert response.status_code == 200
+        schema = json.loads(response.content)
+        validate_schema(schema)
+        assert list(schema['paths']) == ['/api/tagged']
+        assert list(schema['components']['schemas']) == ['Tagged']
+
+        response = APIClient().get('/api/schema?tag=api&tag=tagged', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        assert len(json.loads(response.content)['paths']) == 4
+
+        response = APIClient().get('/api/schema/tags')
+        assert response.status_code == 200
+        tags = response.json()['tags']
+        assert [(t['name'], t['operations']) for t in tags] == [('api', 3), ('tagged', 1)]
+        response = APIClient().get('/api/schema?tag=tagged', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        assert tags[1]['size'] == len(response.content)
+
+        # unknown tags are ignored
+        response = APIClient().get(
+            '/api/schema?tag=tagged&tag=unknown', HTTP_ACCEPT='application/vnd.oai.openapi+json'
+        )
+        assert list(json.loads(response.content)['paths']) == ['/api/tagged']
+    invalidate_schema_cache()
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_SUBSET_CACHE_MAXSIZE', 1)
+def test_spectacular_view_tags_cache_is_bounded(no_warnings):
+    invalidate_schema_cache()
+    for i in range(5):
+        response = APIClient().get(f'/api/schema?tag=unknown{i}', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        assert not json.loads(response.content)['paths']
+    # the full schema and one sub-schema for all unknown tags
+    assert len(SCHEMA_CACHE) == 1 and len(SUBSET_SCHEMA_CACHE) == 1
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_SUBSET_CACHE_MAXSIZE', 1)
+def test_spectacular_view_tag_index_sizes_computed_once(no_warnings):
+    invalidate_schema_cache()
+    response_1 = APIClient().get('/api/schema/tags')
+    with mock.patch('drf_spectacular.cache.filter_schema_by_tags') as filter_schema:
+        response_2 = APIClient().get('/api/schema/tags')
+    assert not filter_schema.called
+    assert response_1.json() == response_2.json()
+    # sizes of all tags are kept with the full schema, not in the bounded subset cache
+    assert len(SUBSET_SCHEMA_CACHE) == 0
+    invalidate_schema_cache()
+
+    APIClient().get('/api/schema?tag=api')
+    APIClient().get('/api/schema?tag=tagged')
+    assert len(SCHEMA_CACHE) == 1 and len(SUBSET_SCHEMA_CACHE) == 1
+    invalidate_schema_cache()
+
+
+@pytest.mark.parametrize('serve_cache', [False, True])
+@pytest.mark.urls(__name__)
+def test_spectacular_view_endpoint_filter(no_warnings, serve_cache):
+    invalidate_schema_cache()
+    with mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', serve_cache):
+        response = APIClient().get('/api/schema?path=/api/tagged', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        assert response.status_code == 200
+        schema = json.loads(response.content)
+        validate_schema(schema)
+        assert list(schema['paths']) == ['/api/tagged']
+        assert list(schema['components']['schemas']) == ['Tagged']
+
+        response = APIClient().get(
+            '/api/schema?exclude_path=/api/schema&exclude_method=post', HTTP_ACCEPT='application/vnd.oai.openapi+json'
+        )
+        assert list(json.loads(response.content)['paths']) == ['/api/admin', '/api/tagged']
+
+        # unfiltered schema is unaffected
+        response = APIClient().get('/api/schema', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        assert len(json.loads(response.content)['paths']) == 4
+    invalidate_schema_cache()
+
+
+@pytest.mark.urls(__name__)
+@mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_CACHE', True)
+def test_spectacular_view_endpoint_filter_globs(no_warnings):
+    invalidate_schema_cache()
+    response = APIClient().get('/api/schema?path=/api/*ed', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+    assert list(json.loads(response.content)['paths']) == ['/api/tagged']
+    # regular expressions are taken literally
+    for pattern in ['[', '(a+)+$', '/api/.*']:
+        response = APIClient().get(f'/api/schema?path={pattern}', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        assert response.status_code == 200
+        assert not json.loads(response.content)['paths']
+
+    # every distinct subset is an entry of the bounded cache
+    with mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_SUBSET_CACHE_MAXSIZE', 2):
+        for i in range(5):
+            APIClient().get(f'/api/schema?path=/api/{i}')
+    assert len(SUBSET_SCHEMA_CACHE) == 2
+    assert not len(SCHEMA_CACHE)
+    invalidate_schema_cache()
+
+
+@pytest.mark.urls(__name__)
+def test_spectacular_view_endpoint_filter_invalid(no_warnings):
+    with mock.patch('drf_spectacular.settings.spectacular_settings.SERVE_ARTIFACTS', {'openapi': 'schema.yml'}):
+        response = APIClient().get('/api/schema?method=get', HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        assert response.status_code == 400